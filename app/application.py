@@ -1,60 +1,186 @@
 # app/application.py
-import uuid
-from contextlib import asynccontextmanager
+import asyncio
+import functools
+import logging
+import os
+from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import Path
 
+import jinja2
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from app.db.db import DbWork
 from app.kv import Kv
+from app.middleware.security_middleware import SecurityMiddleware
 from app.routes import api
-from app.utils.eec import Eec
+from app.utils.keyfile import load_or_create
 from app.utils.rsa import Rsa
+from app.utils.response import OrjsonResponse
+from app.utils.rsa_pool import RsaPool
+from app.utils.static_files import CachedStaticFiles
+from config import Config
+
+try:
+    # 安装了 uvloop 时使用基于 libuv 的事件循环；Windows 等不支持的平台保持默认循环
+    import uvloop
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    uvloop = None
+
+# 项目目录，导入时计算一次；静态资源和模板均使用绝对路径，与启动时的工作目录无关
+DIR_BASE = Path(__file__).resolve().parent.parent  # 指向项目根目录
+DIR_WEB = DIR_BASE / 'web'
+DIR_KEYS = DIR_BASE / '.keys'
+
+logger = logging.getLogger(__name__)
+
+
+async def _init_rsa_bg(app: FastAPI, config: type[Config]):
+    """
+    后台初始化服务器公私钥，结束后置位 rsa_ready。
+    失败时异常记录到 app.state.rsa_error 并照常置位，等待中的请求据此返回错误而不是一直挂起。
+    """
+    try:
+        if config.Rsa.pool_size > 0:
+            # 从预生成的密钥池认领私钥，池为空时在认领路径上现场生成
+            pool = RsaPool(DIR_KEYS, size=config.Rsa.pool_size)
+            key_path = pool.claim()
+            app.state.rsa_pool = pool
+            app.state.rsa_key_path = key_path
+        else:
+            key_path = DIR_KEYS / 'server_rsa.pem'
+
+        _rsa = Rsa()
+        # 密钥生成/解析是 CPU 密集操作，放到线程中执行避免阻塞事件循环
+        await asyncio.to_thread(_rsa.init, key_path)
+        app.state.rsa = _rsa
+
+        if config.Rsa.pool_size > 0:
+            app.state.rsa_pool.start_filler()
+    except Exception as e:
+        logger.exception("RSA 密钥初始化失败")
+        app.state.rsa_error = e
+    finally:
+        app.state.rsa_ready.set()
+
+
+def _on_rsa_task_done(task: asyncio.Task):
+    """兜底：_init_rsa_bg 之外的异常也要取出并记录，避免直到垃圾回收时才暴露"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("RSA 初始化任务异常退出", exc_info=task.exception())
+
+
+# --- 启动步骤 ---
+# 每个步骤是一个异步上下文管理器：yield 之前为初始化，之后为清理。
+# lifespan 按顺序进入各步骤，关闭时按相反顺序清理。
 
+@asynccontextmanager
+async def init_dirs(app: FastAPI, config: type[Config]):
+    app.state.DIR_base = DIR_BASE
+    app.state.DIR_web = DIR_WEB
+    yield
 
 
 @asynccontextmanager
-async def lifespan(app: FastAPI):
-
+async def init_kv(app: FastAPI, config: type[Config]):
     # 初始化异步键值对管理器
     app.state.kv = Kv()
+    yield
+
+
+@asynccontextmanager
+async def init_rsa(app: FastAPI, config: type[Config]):
+    # 初始化服务器公私钥（首次运行生成并缓存到磁盘，之后直接加载）
+    # 在后台进行，不阻塞启动；需要密钥的处理函数先 await app.state.rsa_ready.wait()
+    app.state.rsa_ready = asyncio.Event()
+    app.state.rsa_error = None
+    rsa_task = asyncio.create_task(_init_rsa_bg(app, config))
+    rsa_task.add_done_callback(_on_rsa_task_done)
+    try:
+        yield
+    finally:
+        if not rsa_task.done():
+            rsa_task.cancel()
+        if getattr(app.state, 'rsa_pool', None):
+            app.state.rsa_pool.release(app.state.rsa_key_path)
+
 
-    # 初始化服务器公私钥
-    _rsa = Rsa()
-    _rsa.init()
-    app.state.rsa = _rsa
+@asynccontextmanager
+async def init_aes_key(app: FastAPI, config: type[Config]):
+    # 初始化服务器aes密钥（16位十六进制字符串），持久化后重启不失效
+    aes_key = load_or_create(DIR_KEYS / 'aes.key', lambda: os.urandom(8).hex().encode())
+    app.state.key = aes_key.decode()
+    yield
 
-    # 初始化服务器aes密钥
-    app.state.key = Eec.Hash.sha256(app.state.rsa.get_public_key_pem() + str(uuid.uuid4()))[:16]
 
-    # 初始化数据库接口
+@asynccontextmanager
+async def init_db(app: FastAPI, config: type[Config]):
+    # 初始化数据库接口（与密钥初始化并行）
     db_work = await DbWork.create_async()
     app.state.db = db_work.get_db()
+    try:
+        yield
+    finally:
+        await app.state.db.close()
 
 
-    
+@asynccontextmanager
+async def init_templates(app: FastAPI, config: type[Config]):
+    # 预编译全部模板，避免首次渲染时解析
+    for name in app.state.templates.env.list_templates():
+        app.state.get_template(name)
+    yield
+
+
+STARTUP_STEPS = (init_dirs, init_kv, init_rsa, init_aes_key, init_db, init_templates)
+
 
-    # 获取目录信息
-    app.state.DIR_base = Path(__file__).resolve().parent.parent  # 指向项目根目录
-    app.state.DIR_web = app.state.DIR_base / 'web'
+def create_templates(config: type[Config]) -> Jinja2Templates:
+    """按配置创建模板环境：调试模式下模板修改后自动重新加载，否则已编译模板常驻内存"""
+    templates = Jinja2Templates(directory=DIR_WEB / "template")
+    templates.env.bytecode_cache = jinja2.FileSystemBytecodeCache()
+    templates.env.auto_reload = config.debug
+    if not config.debug:
+        # 已编译模板常驻内存，不按 LRU 淘汰
+        templates.env.cache = {}
+    return templates
 
-    yield  # 应用开始接收请求
 
+def create_app(config: type[Config] = Config, steps=STARTUP_STEPS) -> FastAPI:
+    """
+    创建应用实例。
 
+    :param config: 配置类，默认使用 config.Config。
+    :param steps: 启动步骤列表，按顺序初始化，关闭时逆序清理。
+    """
 
-def create_app() -> FastAPI:
-    _app = FastAPI(lifespan=lifespan)
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        async with AsyncExitStack() as stack:
+            for step in steps:
+                await stack.enter_async_context(step(app, config))
+            yield  # 应用开始接收请求
+
+    _app = FastAPI(lifespan=lifespan, default_response_class=OrjsonResponse)
     # 添加中间件
-    # _app.add_middleware(SecurityMiddleware)  # type: ignore
+    if config.security_enabled:
+        _app.add_middleware(SecurityMiddleware)  # type: ignore
+    # 挂载静态资源目录
+    static_files = CachedStaticFiles(directory=DIR_WEB / "static", max_age=0 if config.debug else 31536000,
+                                     url_prefix="/static")
+    _app.mount("/static", static_files, name="static")
+    # 模板环境随传入的 config 创建
+    templates = create_templates(config)
+    # 模板中用 static_url('js/tools.js') 引用静态资源，URL 带版本参数，可被浏览器长期缓存
+    templates.env.globals['static_url'] = static_files.url_for
+    _app.state.templates = templates
+    # 路由直接用 state.get_template(name).render(...) 渲染并返回 HTMLResponse，跳过 TemplateResponse；
+    # 调试模式下不缓存，保留模板修改后自动重新加载
+    _app.state.get_template = (templates.env.get_template if config.debug
+                               else functools.lru_cache(maxsize=None)(templates.env.get_template))
+    _app.include_router(api.router)
     return _app
 
-
 app = create_app()
-# 挂载静态资源目录
-app.mount("/static", StaticFiles(directory="web/static"), name="static")
-
-# 设置模板路径
-templates = Jinja2Templates(directory="web/template")
-app.include_router(api.router)
@@ -1,24 +1,33 @@
 ﻿"""app/auth/permission_list.py"""
+from types import MappingProxyType
 
-OTHER_PERMISSIONS = []
+OTHER_PERMISSIONS = frozenset({
 
-USER_PERMISSIONS = [
+})
 
-]
+USER_PERMISSIONS = frozenset({
 
-ADMIN_PERMISSIONS = [
+})
 
-]
+ADMIN_PERMISSIONS = frozenset({
 
-SUPER_ADMIN_PERMISSIONS = ADMIN_PERMISSIONS + [
+})
+
+SUPER_ADMIN_PERMISSIONS = ADMIN_PERMISSIONS | frozenset({
     "super_add_user",
     "super_get_database_info",
 
-]
+})
 
-PERMISSION_GROUPS = {
+PERMISSION_GROUPS = MappingProxyType({
     "other": OTHER_PERMISSIONS,
     "user": USER_PERMISSIONS,
     "admin": ADMIN_PERMISSIONS,
     "super_admin": SUPER_ADMIN_PERMISSIONS,
-}
+})
+
+# 权限 -> 拥有该权限的权限组，检查时一次字典查找即可
+PERM_TO_GROUPS = MappingProxyType({
+    perm: frozenset(group for group, perms in PERMISSION_GROUPS.items() if perm in perms)
+    for perm in frozenset().union(*PERMISSION_GROUPS.values())
+})
@@ -0,0 +1,28 @@
+"""app/db/_uuid.py：各数据库后端共用的 UUID 编解码与生成"""
+import collections
+import os
+import uuid
+from typing import Optional
+
+
+def pack(u: Optional[str]) -> Optional[bytes]:
+    """UUID 字符串 -> 16 字节，空值保持为 None"""
+    return uuid.UUID(u).bytes if u else None
+
+
+def unpack(b: Optional[bytes]) -> Optional[str]:
+    """16 字节 -> UUID 字符串，空值保持为 None"""
+    return str(uuid.UUID(bytes=b)) if b else None
+
+
+# 预先批量读取的随机字节，切分为 16 字节用于生成 UUID，避免每个 UUID 一次 os.urandom 系统调用
+_UUID_BATCH = 256
+_UUID_POOL: collections.deque = collections.deque()
+
+
+def next_uuid() -> uuid.UUID:
+    """从随机字节池中取出 16 字节生成版本 4 的 UUID，池空时一次补充 _UUID_BATCH 个"""
+    if not _UUID_POOL:
+        buf = os.urandom(16 * _UUID_BATCH)
+        _UUID_POOL.extend(buf[i:i + 16] for i in range(0, len(buf), 16))
+    return uuid.UUID(bytes=_UUID_POOL.popleft(), version=4)
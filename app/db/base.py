@@ -1,7 +1,7 @@
 ﻿"""app/db/base.py"""
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, AsyncContextManager
-from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple, AsyncContextManager
+import functools
 import logging
 
 """
@@ -68,7 +68,8 @@ app/db/base.py
      - idx_message_is_deleted (is_deleted)
      - idx_message_reply_to (reply_to)
      - idx_message_room_time (room_uuid, created_at DESC)
-     - idx_message_room_active (room_uuid, is_deleted, created_at DESC)
+     - idx_message_room_active (room_uuid, is_deleted, created_at DESC, msg_uuid DESC, sender, msg_type)
+       覆盖索引：消息列表（get_room_message_summaries）可直接从索引得到结果，无需回表
 
 4. `private_message` 表
    存储私聊消息。
@@ -88,7 +89,11 @@ app/db/base.py
      - idx_pm_receiver (receiver_uuid)
      - idx_pm_created_at (created_at)
      - idx_pm_is_read (is_read)
-     - idx_pm_conversation (sender_uuid, receiver_uuid, created_at DESC)
+     - idx_pm_conversation (sender_uuid, receiver_uuid, created_at DESC, msg_uuid DESC, msg_type, is_deleted)
+   MySQL 实现另有虚拟生成列 conv_key = CONCAT(LEAST(sender_uuid, receiver_uuid), GREATEST(sender_uuid, receiver_uuid))，
+   以 idx_pm_conv_time (conv_key, is_deleted, created_at DESC, msg_uuid DESC) 代替 idx_pm_conversation，
+   会话查询不再需要对两个方向做 OR
+   异步 SQLite 实现另有 idx_pm_receiver_sender (receiver_uuid, sender_uuid)
 
 5. `user_room` 表
    存储用户与房间的多对多关系。
@@ -126,7 +131,15 @@ app/db/base.py
 - 外键约束必须支持级联删除或置空，以确保数据一致性。
 - BOOLEAN 类型在 SQLite 中用 INTEGER (0/1) 表示，在 MySQL 中用 TINYINT (0/1) 或 BOOLEAN。
 - STRING 类型在 SQLite 中用 TEXT，在 MySQL 中用 VARCHAR 或 CHAR（需指定长度）。
+- UUID 列以 16 字节存储（SQLite 中为 BLOB，声明类型 UUIDBLOB；MySQL 中为 BINARY(16)），接口参数与返回值仍为 UUID 字符串。
 - 索引为高频查询优化（如消息按时间排序、房间活跃消息），具体实现可根据数据库引擎调整。
+  异步 SQLite 实现不创建布尔列和低基数列的索引（idx_user_is_active、idx_room_is_active、
+  idx_message_is_deleted、idx_pm_is_read、idx_message_msg_type），也不创建已被复合索引或唯一约束
+  前缀覆盖的索引（idx_message_room_uuid、idx_message_room_time、idx_pm_sender、idx_pm_receiver、
+  idx_user_room_user、idx_read_status_user），已有数据库初始化时会删除这些索引。
+- 消息分页使用键集分页（按 (created_at, msg_uuid) 定位），不使用 OFFSET。
+  created_at 精确到秒，msg_uuid 是随机的版本 4 UUID，只用于让排序和游标唯一：
+  同一秒内的多条消息之间的先后是任意的，不保证与发送顺序一致。
 - 各实现需确保并发安全（如 SQLite 的连接管理和 MySQL 的事务隔离级别）。
 """
 
@@ -146,7 +159,16 @@ class AbstractAsyncDB(ABC):
         """
         self.db_config = db_config
         self._initialized = False
-        self.logger = logging.getLogger(self.__class__.__name__)
+        self.logger = self._get_logger()
+
+    @classmethod
+    @functools.cache
+    def _get_logger(cls) -> logging.Logger:
+        """
+        每个具体实现使用 "<模块名>.<类名>" 命名的 logger，首次使用时创建并缓存；
+        挂在实现所在模块的 logger 之下，按模块配置的日志级别和处理器对其生效
+        """
+        return logging.getLogger(f"{cls.__module__}.{cls.__name__}")
 
     @abstractmethod
     async def init_database(self):
@@ -157,17 +179,25 @@ class AbstractAsyncDB(ABC):
         pass
 
     @abstractmethod
-    @asynccontextmanager
-    async def get_connection(self) -> AsyncContextManager:
+    def get_connection(self) -> AsyncContextManager:
         """
-        获取数据库连接的异步上下文管理器。
-        每次调用返回一个新的连接，确保异步操作的正确性。
+        获取数据库连接的异步上下文管理器，用法为 `async with db.get_connection() as conn`。
+        实现通常用 @asynccontextmanager 装饰自己的 async 生成器方法。
+        连接从实现维护的连接池中借出，退出上下文时归还（而不是关闭），
+        持有期间该连接只属于当前协程。发生异常时实现需回滚未提交的事务。
 
         Returns:
             AsyncContextManager: 数据库连接的上下文管理器。
         """
         pass
 
+    @abstractmethod
+    async def close(self):
+        """
+        关闭数据库连接池，释放所有连接。应用关闭时调用。
+        """
+        pass
+
     @abstractmethod
     async def execute_transaction(self, operations: List[tuple]) -> bool:
         """
@@ -181,6 +211,22 @@ class AbstractAsyncDB(ABC):
         """
         pass
 
+    @abstractmethod
+    async def execute_many(self, sql: str, params_seq: List[tuple]) -> int:
+        """
+        在单个事务中用同一条 SQL 批量执行多组参数（executemany），
+        SQL 只需解析一次，适合批量插入/更新等同构操作。
+        异构操作请使用 execute_transaction。
+
+        Args:
+            sql (str): 要执行的 SQL 语句。
+            params_seq (List[tuple]): 参数元组列表。
+
+        Returns:
+            int: 受影响的行数，失败返回 -1。
+        """
+        pass
+
     @abstractmethod
     async def get_database_info(self) -> dict:
         """
@@ -232,6 +278,33 @@ class AbstractAsyncDB(ABC):
         """
         pass
 
+    @abstractmethod
+    async def get_user_public(self, user_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        异步获取用户的公开信息，用于展示（如消息发送者），不读取密码哈希等字段。
+
+        Args:
+            user_uuid (str): 用户 UUID。
+
+        Returns:
+            Optional[Dict[str, Any]]: 包含 user_uuid, qq_number, name, avatar_path, role, is_active 的字典，
+            用户不存在或不活跃时返回 None。
+        """
+        pass
+
+    @abstractmethod
+    async def get_user_auth(self, user_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        异步获取用户的认证信息，用于校验密码和权限。
+
+        Args:
+            user_uuid (str): 用户 UUID。
+
+        Returns:
+            Optional[Dict[str, Any]]: 包含 user_uuid, role, password_hash 的字典，用户不存在或不活跃时返回 None。
+        """
+        pass
+
     @abstractmethod
     async def update_user(self, user_uuid: str, update_data: Dict[str, Any]) -> bool:
         """
@@ -273,20 +346,84 @@ class AbstractAsyncDB(ABC):
         pass
 
     @abstractmethod
-    async def get_room_messages(self, room_uuid: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+    async def send_messages_bulk(self, messages: List[Dict[str, Any]]) -> List[str]:
         """
-        异步获取房间消息（分页）。
+        在单个事务中批量发送房间消息。
+
+        Args:
+            messages (List[Dict[str, Any]]): 消息数据字典列表。
+
+        Returns:
+            List[str]: 与输入顺序一致的消息 UUID 列表，失败返回空列表。
+        """
+        pass
+
+    @staticmethod
+    def next_page_cursor(messages: List[Dict[str, Any]]) -> Optional[Tuple[int, str]]:
+        """
+        由一页消息得到下一页的键集分页游标，即最后一条消息的 (created_at, msg_uuid)。
+        适用于 get_room_messages、get_room_message_summaries 和 get_private_messages 的结果。
+
+        Args:
+            messages (List[Dict[str, Any]]): 上一页的消息列表。
+
+        Returns:
+            Optional[Tuple[int, str]]: 作为下一次调用的 before 参数；列表为空（没有更多消息）时返回 None。
+        """
+        if not messages:
+            return None
+        last = messages[-1]
+        return last['created_at'], last['msg_uuid']
+
+    @abstractmethod
+    async def get_room_messages(self, room_uuid: str, limit: int = 50,
+                                before: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
+        """
+        异步获取房间消息（键集分页），按 (created_at, msg_uuid) 倒序。
+        每页代价只与 limit 有关，与翻页深度无关。
 
         Args:
             room_uuid (str): 房间 UUID。
             limit (int): 每页消息数量，默认 50。
-            offset (int): 偏移量，默认 0。
+            before (Optional[Tuple[int, str]]): 上一页最后一条消息的 (created_at, msg_uuid)，
+                只返回排在它之后（更早）的消息；为 None 时返回最新一页。
+                可用 next_page_cursor(上一页结果) 得到。
 
         Returns:
             List[Dict[str, Any]]: 消息列表。
         """
         pass
 
+    @abstractmethod
+    async def get_room_message_summaries(self, room_uuid: str, limit: int = 50,
+                                         before: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
+        """
+        异步获取房间消息摘要（键集分页），只包含 msg_uuid, sender, msg_type, created_at，
+        可由覆盖索引直接返回，适合消息列表；消息正文通过 get_message 按需获取。
+
+        Args:
+            room_uuid (str): 房间 UUID。
+            limit (int): 每页消息数量，默认 50。
+            before (Optional[Tuple[int, str]]): 上一页最后一条消息的 (created_at, msg_uuid)，为 None 时返回最新一页。
+
+        Returns:
+            List[Dict[str, Any]]: 消息摘要列表。
+        """
+        pass
+
+    @abstractmethod
+    async def get_message(self, msg_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        异步根据 UUID 获取单条房间消息（含正文）。
+
+        Args:
+            msg_uuid (str): 消息 UUID。
+
+        Returns:
+            Optional[Dict[str, Any]]: 消息字典，不存在或已删除返回 None。
+        """
+        pass
+
     @abstractmethod
     async def send_private_message(self, message_data: Dict[str, Any]) -> str:
         """
@@ -314,16 +451,16 @@ class AbstractAsyncDB(ABC):
         pass
 
     @abstractmethod
-    async def get_private_messages(self, user_uuid1: str, user_uuid2: str, limit: int = 50, offset: int = 0) -> List[
-        Dict[str, Any]]:
+    async def get_private_messages(self, user_uuid1: str, user_uuid2: str, limit: int = 50,
+                                   before: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
         """
-        异步获取两个用户之间的私聊消息（分页）。
+        异步获取两个用户之间的私聊消息（键集分页），按 (created_at, msg_uuid) 倒序。
 
         Args:
             user_uuid1 (str): 用户1 UUID。
             user_uuid2 (str): 用户2 UUID。
             limit (int): 每页消息数量，默认 50。
-            offset (int): 偏移量，默认 0。
+            before (Optional[Tuple[int, str]]): 上一页最后一条消息的 (created_at, msg_uuid)，为 None 时返回最新一页。
 
         Returns:
             List[Dict[str, Any]]: 私聊消息列表。
@@ -8,6 +8,8 @@ from config import Config
 
 DbConfig = Config.DbConfig
 
+logger = logging.getLogger(__name__)
+
 
 class DbWork:
     """
@@ -20,7 +22,7 @@ class DbWork:
 
        Args:
        """
-        self.logger = logging.getLogger(self.__class__.__name__)
+        self.logger = logger
         self.db = self._get_db_instance({'db_path': DbConfig.Sqlite.path})
         self.logger.info(f"DbWork 初始化，使用的数据库类型: {DbConfig.use}")
 
@@ -46,29 +48,18 @@ class DbWork:
         else:
             raise ValueError(f"Unsupported database type: {db_type}")
 
-    async def init_async(self):
-        """
-        初始化数据库，调用底层数据库实现的 init_database 方法。
-        """
-        await self.db.init_database()
-        self.logger.info("数据库初始化完成")
-
     @classmethod
     async def create_async(cls) -> 'DbWork':
         """
-        创建 DbWork 实例并初始化数据库。
+        创建 DbWork 实例并初始化数据库，这是获取 DbWork 的唯一入口。
+        数据库实例只构造一次，init_database 也只执行一次。
 
         Returns:
             DbWork: 初始化完成的 DbWork 实例。
         """
         instance = cls()
-        await instance.init_async()
-        return instance
-
-    @classmethod
-    def create(cls) -> 'DbWork':
-        instance = cls()
-        instance.init_async()
+        await instance.db.init_database()
+        instance.logger.info("数据库初始化完成")
         return instance
 
     def get_db(self) -> AbstractAsyncDB:
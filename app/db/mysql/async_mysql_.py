@@ -1,14 +1,18 @@
 ﻿"""app/db/mysql/async_mysql_.py (异步版本)"""
 
 import aiomysql
-import uuid
+from pymysql.constants import CLIENT
 import asyncio
-from datetime import datetime, UTC
-from typing import Optional, List, Dict, Any, AsyncContextManager
+import collections
+import functools
+import itertools
+import time
+from typing import Optional, List, Dict, Any, Tuple, AsyncContextManager, AsyncIterator
 from contextlib import asynccontextmanager
 import logging
 
 from app.db.base import AbstractAsyncDB
+from app.db._uuid import pack as _pack, unpack as _unpack, next_uuid as _next_uuid
 
 
 # --- 异步最佳实践建议 ---
@@ -16,8 +20,157 @@ from app.db.base import AbstractAsyncDB
 # 2. 所有数据库操作都是异步的，需要使用 await 关键字
 # 3. 连接管理通过异步上下文管理器实现
 # 4. 使用连接池提高性能
+# 5. send_message 经后台任务合批，短时间内到达的消息合并为一条多行 INSERT
+# 6. 时间戳列由列默认值 (UNIX_TIMESTAMP()) 或 SQL 中的 UNIX_TIMESTAMP() 生成，客户端不传入
+# 7. UUID 以 BINARY(16) 存储，绑定参数前用 _pack 转为字节，结果经 _to_dict 还原为字符串
+# 8. 连接工作在自动提交模式，单语句写入无需 commit；多语句写入需显式开启事务
 # ------------------------------------
 
+
+# 查询结果的列名，与对应 SELECT 的列顺序一致；使用默认的元组游标，按需用 zip 组装字典
+USER_COLS = ('user_uuid', 'qq_number', 'name', 'avatar_path', 'role', 'password_hash', 'inviter',
+             'is_active', 'last_login_at', 'created_at', 'updated_at')
+USER_LOGIN_COLS = ('user_uuid', 'qq_number', 'name', 'avatar_path', 'role', 'password_hash', 'is_active')
+USER_PUBLIC_COLS = ('user_uuid', 'qq_number', 'name', 'avatar_path', 'role', 'is_active')
+USER_AUTH_COLS = ('user_uuid', 'role', 'password_hash')
+MESSAGE_COLS = ('msg_uuid', 'sender', 'msg_type', 'content', 'room_uuid', 'reply_to',
+                'file_path', 'file_size', 'created_at', 'sender_name', 'sender_avatar')
+MESSAGE_SUMMARY_COLS = ('msg_uuid', 'sender', 'msg_type', 'created_at')
+PRIVATE_MESSAGE_COLS = ('msg_uuid', 'sender_uuid', 'receiver_uuid', 'msg_type', 'content',
+                        'reply_to', 'file_path', 'file_size', 'is_read', 'created_at',
+                        'sender_name', 'sender_avatar', 'receiver_name', 'receiver_avatar')
+
+# 以 BINARY(16) 存储 UUID 的列
+_UUID_COLS = frozenset({
+    'user_uuid', 'inviter', 'room_uuid', 'creator', 'msg_uuid', 'sender',
+    'reply_to', 'sender_uuid', 'receiver_uuid', 'message_uuid'
+})
+
+
+def _conv_key(user_uuid1: str, user_uuid2: str) -> bytes:
+    """两个用户的会话键，与 private_message.conv_key 生成列的计算方式一致"""
+    b1, b2 = _pack(user_uuid1), _pack(user_uuid2)
+    return b1 + b2 if b1 <= b2 else b2 + b1
+
+
+def _to_dict(cols: Tuple[str, ...], row: tuple) -> Dict[str, Any]:
+    """按列名把一行结果组装为字典，UUID 列还原为字符串"""
+    return {col: _unpack(value) if col in _UUID_COLS else value for col, value in zip(cols, row)}
+
+
+def _db_op(action: str, default: Any = None):
+    """
+    数据库操作装饰器：捕获异常并记录日志，返回失败时的默认值。
+    default 为可调用对象时（如 list）返回其调用结果，避免共享可变对象。
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await fn(self, *args, **kwargs)
+            except Exception as e:
+                self.logger.error("%s失败: %s", action, e)
+                return default() if callable(default) else default
+        return wrapper
+    return decorator
+
+
+# update_user 允许更新的列
+_USER_UPDATABLE_FIELDS = frozenset({
+    'qq_number', 'name', 'avatar_path', 'role', 'password_hash', 'inviter', 'is_active', 'last_login_at'
+})
+
+# 多行 INSERT 使用的列及单行占位符
+_MESSAGE_INSERT_PREFIX = '''
+    INSERT INTO message (msg_uuid, sender, msg_type, content, room_uuid,
+                         reply_to, file_path, file_size)
+    VALUES '''
+_MESSAGE_ROW_PLACEHOLDER = '(%s, %s, %s, %s, %s, %s, %s, %s)'
+
+# 分页读取单页的最大行数，超出的 limit 会被截断；需要更多数据时使用 iter_* 流式接口
+_MAX_PAGE_SIZE = 500
+
+
+def _seek_variants(template: str, alias: str) -> Tuple[str, str]:
+    """
+    由含 {seek} 占位的查询模板生成 (首页, 带键集分页条件) 两个版本，
+    在导入时拼接完成，调用时按 before 是否为 None 取用，不再逐次格式化 SQL。
+    """
+    return (template.format(seek=''),
+            template.format(seek=f'AND ({alias}.created_at, {alias}.msg_uuid) < (%s, %s)'))
+
+
+# --- SQL 语句 ---
+# 各方法引用同一字符串对象，不在调用时重新构造
+_SQL_INSERT_USER = '''
+    INSERT INTO user (user_uuid, qq_number, name, avatar_path, role, password_hash, inviter)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)'''
+_SQL_SELECT_USER_BY_UUID = (
+    'SELECT user_uuid, qq_number, name, avatar_path, role, password_hash, inviter, '
+    'is_active, last_login_at, created_at, updated_at '
+    'FROM user WHERE user_uuid = %s AND is_active = 1')
+_SQL_SELECT_USER_BY_QQ = (
+    'SELECT user_uuid, qq_number, name, avatar_path, role, password_hash, is_active '
+    'FROM user WHERE qq_number = %s AND is_active = 1')
+# 只取展示所需的列，不传输密码哈希和审计字段
+_SQL_SELECT_USER_PUBLIC = (
+    'SELECT user_uuid, qq_number, name, avatar_path, role, is_active '
+    'FROM user WHERE user_uuid = %s AND is_active = 1')
+_SQL_SELECT_USER_AUTH = 'SELECT user_uuid, role, password_hash FROM user WHERE user_uuid = %s AND is_active = 1'
+_SQL_INSERT_PM = '''
+    INSERT INTO private_message (msg_uuid, sender_uuid, receiver_uuid, msg_type, content,
+                                 reply_to, file_path, file_size)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)'''
+_ROOM_MESSAGES_SELECT = '''
+    SELECT m.msg_uuid, m.sender, m.msg_type, m.content, m.room_uuid, m.reply_to,
+           m.file_path, m.file_size, m.created_at,
+           u.name as sender_name, u.avatar_path as sender_avatar
+    FROM message m
+    LEFT JOIN user u ON m.sender = u.user_uuid'''
+_SQL_ROOM_MESSAGES_ALL = _seek_variants(_ROOM_MESSAGES_SELECT + '''
+    WHERE m.room_uuid = %s AND m.is_deleted = 0 {seek}
+    ORDER BY m.created_at DESC, m.msg_uuid DESC''', 'm')
+_SQL_ROOM_MESSAGES = tuple(sql + ' LIMIT %s' for sql in _SQL_ROOM_MESSAGES_ALL)
+_SQL_ROOM_MESSAGE_SUMMARIES = _seek_variants('''
+    SELECT msg_uuid, sender, msg_type, created_at
+    FROM message
+    WHERE room_uuid = %s AND is_deleted = 0 {seek}
+    ORDER BY created_at DESC, msg_uuid DESC
+    LIMIT %s''', 'message')
+_SQL_GET_MESSAGE = _ROOM_MESSAGES_SELECT + '''
+    WHERE m.msg_uuid = %s AND m.is_deleted = 0'''
+_SQL_CREATE_ROOM = '''
+    START TRANSACTION;
+    INSERT INTO room (room_uuid, name, description, avatar_path,
+                      max_online_users, max_join_users, creator)
+    VALUES (%s, %s, %s, %s, %s, %s, %s);
+    INSERT INTO user_room (user_uuid, room_uuid, role)
+    VALUES (%s, %s, 'owner');
+    COMMIT'''
+_SQL_JOIN_ROOM = '''
+    INSERT INTO user_room (user_uuid, room_uuid, role, left_at)
+    VALUES (%s, %s, 'member', NULL)
+    ON DUPLICATE KEY UPDATE joined_at = UNIX_TIMESTAMP(), left_at = NULL'''
+_SQL_LEAVE_ROOM = '''
+    UPDATE user_room SET left_at = UNIX_TIMESTAMP()
+    WHERE user_uuid = %s AND room_uuid = %s AND left_at IS NULL'''
+_SQL_PRIVATE_MESSAGE_USERS = '''
+    SELECT DISTINCT CASE WHEN sender_uuid = %s THEN receiver_uuid ELSE sender_uuid END AS user_uuid
+    FROM private_message
+    WHERE sender_uuid = %s OR receiver_uuid = %s'''
+_SQL_PRIVATE_MESSAGES_ALL = _seek_variants('''
+    SELECT pm.msg_uuid, pm.sender_uuid, pm.receiver_uuid, pm.msg_type, pm.content,
+           pm.reply_to, pm.file_path, pm.file_size, pm.is_read, pm.created_at,
+           s.name AS sender_name, s.avatar_path AS sender_avatar,
+           r.name AS receiver_name, r.avatar_path AS receiver_avatar
+    FROM private_message pm
+    LEFT JOIN user s ON pm.sender_uuid = s.user_uuid
+    LEFT JOIN user r ON pm.receiver_uuid = r.user_uuid
+    WHERE pm.conv_key = %s AND pm.is_deleted = 0 {seek}
+    ORDER BY pm.created_at DESC, pm.msg_uuid DESC''', 'pm')
+_SQL_PRIVATE_MESSAGES = tuple(sql + ' LIMIT %s' for sql in _SQL_PRIVATE_MESSAGES_ALL)
+
+
 class AsyncMySQLDB(AbstractAsyncDB):
     """
     一个用于管理MySQL数据库的异步类，支持高并发异步操作。
@@ -38,12 +191,42 @@ class AsyncMySQLDB(AbstractAsyncDB):
         self.password = db_config.get('password', '')
         self.database = db_config.get('database', 'chat_db')
         self.charset = db_config.get('charset', 'utf8mb4')
+        # 连接池最少/最多保持的连接数
         self.pool_size = db_config.get('pool_size', 10)
         self.pool_max_size = db_config.get('pool_max_size', 20)
+        # 连接存活超过 pool_recycle 秒后由连接池重建
+        self.pool_recycle = db_config.get('pool_recycle', 3600)
+        # 连接空闲超过 ping_interval 秒时，借出前先 ping 一次（已断开则自动重连），
+        # 避免被代理或服务器断开的连接在第一次查询时失败
+        self.ping_interval = db_config.get('ping_interval', 30)
+        # 建立连接时执行一次的会话级设置，避免在每次请求中重复发送。
+        # 默认使用 READ-COMMITTED（点查不加间隙锁，减少并发插入与读取间的锁竞争）和 UTC 时区
+        self.init_command = db_config.get(
+            'init_command',
+            "SET SESSION transaction_isolation = 'READ-COMMITTED', time_zone = '+00:00'"
+        )
+
+        # 消息合批：凑满 batch_max_size 条或等待 batch_max_delay 秒后一次写入；
+        # 单条 INSERT 最多 bulk_chunk_size 行，避免超过 max_allowed_packet
+        self.batch_max_size = db_config.get('batch_max_size', 256)
+        self.batch_max_delay = db_config.get('batch_max_delay', 0.005)
+        self.bulk_chunk_size = db_config.get('bulk_chunk_size', 500)
+
+        # 用户记录缓存（LRU + TTL）：最多 user_cache_size 条，缓存 user_cache_ttl 秒，
+        # update_user 时主动失效；user_cache_size 为 0 时关闭缓存
+        self.user_cache_size = db_config.get('user_cache_size', 10000)
+        self.user_cache_ttl = db_config.get('user_cache_ttl', 60)
+        self._user_cache: collections.OrderedDict = collections.OrderedDict()
+        self._user_qq_cache: collections.OrderedDict = collections.OrderedDict()
+        # user_uuid -> qq_number，用于在更新用户时找到 QQ 号缓存中的对应条目
+        self._user_qq_keys: Dict[str, str] = {}
 
         self._pool = None
-        self._connection_lock = asyncio.Lock()
-        self.logger.info(f"异步 MySQL 数据库将连接到 {self.host}:{self.port}/{self.database}")
+        # 初始化完成的一次性信号，首次调用 init_database 时创建
+        self._ready: Optional[asyncio.Future] = None
+        self._message_queue: Optional[asyncio.Queue] = None
+        self._batcher_task: Optional[asyncio.Task] = None
+        self.logger.info("异步 MySQL 数据库将连接到 %s:%s/%s", self.host, self.port, self.database)
 
     async def _create_pool(self):
         """创建连接池"""
@@ -57,9 +240,13 @@ class AsyncMySQLDB(AbstractAsyncDB):
                 charset=self.charset,
                 minsize=self.pool_size,
                 maxsize=self.pool_max_size,
-                autocommit=False,
+                # 单语句写入直接提交，省去 BEGIN/COMMIT 往返；多语句事务显式调用 begin()
+                autocommit=True,
+                # 允许多语句请求，用于一次发送建表 DDL
+                client_flag=CLIENT.MULTI_STATEMENTS,
                 connect_timeout=30,
-                pool_recycle=3600  # 1小时回收连接
+                init_command=self.init_command,
+                pool_recycle=self.pool_recycle
             )
 
     async def init_database(self):
@@ -67,30 +254,32 @@ class AsyncMySQLDB(AbstractAsyncDB):
         异步初始化数据库，创建表结构和索引。
         如果表已存在，则不会重复创建。
         """
-        if self._initialized:
+        if self._ready is not None:
+            # 已完成或正由其他调用方进行初始化，等待同一个 Future 即可
+            await self._ready
             return
 
-        async with self._connection_lock:
-            if self._initialized:
-                return
-
+        ready = self._ready = asyncio.get_running_loop().create_future()
+        try:
             await self._create_pool()
 
-            async with self.get_connection() as conn:
+            # 建表期间尚未初始化完成，直接从连接池获取连接
+            async with self._pool.acquire() as conn:
                 async with conn.cursor() as cursor:
                     # --- 表定义 ---
                     # 与SQLite版本保持功能一致，但使用MySQL语法
+                    # 全部 DDL 作为一条多语句请求发送，只需一次往返
 
-                    # `user` 表
                     await cursor.execute('''
+                        -- `user` 表
                         CREATE TABLE IF NOT EXISTS user (
-                            user_uuid VARCHAR(36) PRIMARY KEY,
+                            user_uuid BINARY(16) PRIMARY KEY,
                             qq_number VARCHAR(20) UNIQUE,
                             name VARCHAR(100) NOT NULL,
                             avatar_path VARCHAR(500),
                             role ENUM('admin', 'super_admin', 'user') DEFAULT 'user',
                             password_hash VARCHAR(255),
-                            inviter VARCHAR(36),
+                            inviter BINARY(16),
                             is_active TINYINT(1) DEFAULT 1,
                             last_login_at BIGINT,
                             created_at BIGINT DEFAULT (UNIX_TIMESTAMP()),
@@ -100,13 +289,11 @@ class AsyncMySQLDB(AbstractAsyncDB):
                             INDEX idx_user_is_active (is_active),
                             INDEX idx_user_created_at (created_at),
                             FOREIGN KEY (inviter) REFERENCES user(user_uuid) ON DELETE SET NULL
-                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                    ''')
+                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
-                    # `room` 表
-                    await cursor.execute('''
+                        -- `room` 表
                         CREATE TABLE IF NOT EXISTS room (
-                            room_uuid VARCHAR(36) PRIMARY KEY,
+                            room_uuid BINARY(16) PRIMARY KEY,
                             name VARCHAR(100) NOT NULL,
                             description TEXT,
                             avatar_path VARCHAR(500),
@@ -115,93 +302,87 @@ class AsyncMySQLDB(AbstractAsyncDB):
                             is_active TINYINT(1) DEFAULT 1,
                             created_at BIGINT DEFAULT (UNIX_TIMESTAMP()),
                             updated_at BIGINT DEFAULT (UNIX_TIMESTAMP()),
-                            creator VARCHAR(36) NOT NULL,
+                            creator BINARY(16) NOT NULL,
                             INDEX idx_room_creator (creator),
                             INDEX idx_room_is_active (is_active),
                             INDEX idx_room_created_at (created_at),
                             FOREIGN KEY (creator) REFERENCES user(user_uuid) ON DELETE CASCADE
-                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                    ''')
+                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
-                    # `message` 表（用于群聊/房间聊天）
-                    await cursor.execute('''
+                        -- `message` 表（用于群聊/房间聊天）
                         CREATE TABLE IF NOT EXISTS message (
-                            msg_uuid VARCHAR(36) PRIMARY KEY,
-                            sender VARCHAR(36) NOT NULL,
+                            msg_uuid BINARY(16) PRIMARY KEY,
+                            sender BINARY(16) NOT NULL,
                             msg_type ENUM('text', 'image', 'audio', 'video', 'system', 'file') DEFAULT 'text',
                             content TEXT NOT NULL,
-                            room_uuid VARCHAR(36) NOT NULL,
-                            reply_to VARCHAR(36),
+                            room_uuid BINARY(16) NOT NULL,
+                            reply_to BINARY(16),
                             file_path VARCHAR(500),
                             file_size BIGINT,
                             is_deleted TINYINT(1) DEFAULT 0,
                             created_at BIGINT DEFAULT (UNIX_TIMESTAMP()),
                             INDEX idx_message_sender (sender),
-                            INDEX idx_message_room_uuid (room_uuid),
                             INDEX idx_message_created_at (created_at),
                             INDEX idx_message_msg_type (msg_type),
                             INDEX idx_message_is_deleted (is_deleted),
                             INDEX idx_message_reply_to (reply_to),
                             INDEX idx_message_room_time (room_uuid, created_at DESC),
-                            INDEX idx_message_room_active (room_uuid, is_deleted, created_at DESC),
+                            INDEX idx_message_room_active (room_uuid, is_deleted, created_at DESC, msg_uuid DESC, sender, msg_type),
                             FOREIGN KEY (sender) REFERENCES user(user_uuid) ON DELETE CASCADE,
                             FOREIGN KEY (room_uuid) REFERENCES room(room_uuid) ON DELETE CASCADE,
                             FOREIGN KEY (reply_to) REFERENCES message(msg_uuid) ON DELETE SET NULL
-                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                    ''')
+                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
-                    # `private_message` 表
-                    await cursor.execute('''
+                        -- `private_message` 表
                         CREATE TABLE IF NOT EXISTS private_message (
-                            msg_uuid VARCHAR(36) PRIMARY KEY,
-                            sender_uuid VARCHAR(36) NOT NULL,
-                            receiver_uuid VARCHAR(36) NOT NULL,
+                            msg_uuid BINARY(16) PRIMARY KEY,
+                            sender_uuid BINARY(16) NOT NULL,
+                            receiver_uuid BINARY(16) NOT NULL,
                             msg_type ENUM('text', 'image', 'audio', 'video', 'system', 'file') DEFAULT 'text',
                             content TEXT NOT NULL,
-                            reply_to VARCHAR(36),
+                            reply_to BINARY(16),
                             file_path VARCHAR(500),
                             file_size BIGINT,
                             is_deleted TINYINT(1) DEFAULT 0,
                             is_read TINYINT(1) DEFAULT 0,
                             created_at BIGINT DEFAULT (UNIX_TIMESTAMP()),
-                            INDEX idx_pm_sender (sender_uuid),
-                            INDEX idx_pm_receiver (receiver_uuid),
+                            -- 与方向无关的会话键，双方的消息落在同一个索引区间。
+                            -- 必须是 VIRTUAL：sender_uuid / receiver_uuid 上有 ON DELETE CASCADE 外键，
+                            -- MySQL 不允许 STORED 生成列的基础列使用 CASCADE；虚拟列上的二级索引不受此限制
+                            conv_key BINARY(32) AS (CONCAT(LEAST(sender_uuid, receiver_uuid), GREATEST(sender_uuid, receiver_uuid))) VIRTUAL,
                             INDEX idx_pm_created_at (created_at),
                             INDEX idx_pm_is_read (is_read),
-                            INDEX idx_pm_conversation (sender_uuid, receiver_uuid, created_at DESC),
+                            INDEX idx_pm_conv_time (conv_key, is_deleted, created_at DESC, msg_uuid DESC),
+                            INDEX idx_pm_sender_receiver (sender_uuid, receiver_uuid),
+                            INDEX idx_pm_receiver_sender (receiver_uuid, sender_uuid),
                             FOREIGN KEY (sender_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
                             FOREIGN KEY (receiver_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
                             FOREIGN KEY (reply_to) REFERENCES private_message(msg_uuid) ON DELETE SET NULL
-                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                    ''')
+                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
-                    # `user_room` 连接表（多对多关系）
-                    await cursor.execute('''
+                        -- `user_room` 连接表（多对多关系）
                         CREATE TABLE IF NOT EXISTS user_room (
                             id INT AUTO_INCREMENT PRIMARY KEY,
-                            user_uuid VARCHAR(36) NOT NULL,
-                            room_uuid VARCHAR(36) NOT NULL,
+                            user_uuid BINARY(16) NOT NULL,
+                            room_uuid BINARY(16) NOT NULL,
                             role ENUM('owner', 'admin', 'member') DEFAULT 'member',
                             is_muted TINYINT(1) DEFAULT 0,
                             joined_at BIGINT DEFAULT (UNIX_TIMESTAMP()),
                             left_at BIGINT,
-                            INDEX idx_user_room_user (user_uuid),
                             INDEX idx_user_room_room (room_uuid),
                             INDEX idx_user_room_joined_at (joined_at),
                             INDEX idx_user_room_left_at (left_at),
                             UNIQUE KEY unique_user_room (user_uuid, room_uuid),
                             FOREIGN KEY (user_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
                             FOREIGN KEY (room_uuid) REFERENCES room(room_uuid) ON DELETE CASCADE
-                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-                    ''')
+                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
-                    # `message_read_status` 表
-                    await cursor.execute('''
+                        -- `message_read_status` 表
                         CREATE TABLE IF NOT EXISTS message_read_status (
                             id INT AUTO_INCREMENT PRIMARY KEY,
-                            user_uuid VARCHAR(36) NOT NULL,
-                            message_uuid VARCHAR(36) NOT NULL,
-                            room_uuid VARCHAR(36) NOT NULL,
+                            user_uuid BINARY(16) NOT NULL,
+                            message_uuid BINARY(16) NOT NULL,
+                            room_uuid BINARY(16) NOT NULL,
                             read_at BIGINT DEFAULT (UNIX_TIMESTAMP()),
                             INDEX idx_read_status_user (user_uuid),
                             INDEX idx_read_status_room (room_uuid),
@@ -212,100 +393,241 @@ class AsyncMySQLDB(AbstractAsyncDB):
                             FOREIGN KEY (room_uuid) REFERENCES room(room_uuid) ON DELETE CASCADE
                         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
                     ''')
+                    # 逐个读取各语句的结果，确保全部执行完毕
+                    while await cursor.nextset():
+                        pass
 
-                await conn.commit()
+                    # 旧版本以 VARCHAR(36) 存储 UUID，与当前编码不兼容，需要先迁移数据
+                    await cursor.execute('''
+                        SELECT DATA_TYPE FROM information_schema.columns
+                        WHERE table_schema = DATABASE() AND table_name = 'user' AND column_name = 'user_uuid'
+                    ''')
+                    row = await cursor.fetchone()
+                    if row and row[0].lower() != 'binary':
+                        raise RuntimeError(f"数据库 {self.database} 使用旧的 VARCHAR(36) UUID 结构，请迁移后再启动")
 
-            self._initialized = True
-            self.logger.info(f"异步MySQL数据库已初始化于 {self.host}:{self.port}/{self.database}")
+                    # 旧版本的 private_message 没有 conv_key 列，补充该列及其索引（VIRTUAL，原因见建表语句）
+                    await cursor.execute('''
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = DATABASE() AND table_name = 'private_message' AND column_name = 'conv_key'
+                    ''')
+                    if await cursor.fetchone() is None:
+                        await cursor.execute('''
+                            ALTER TABLE private_message
+                            ADD COLUMN conv_key BINARY(32) AS (CONCAT(LEAST(sender_uuid, receiver_uuid), GREATEST(sender_uuid, receiver_uuid))) VIRTUAL,
+                            ADD INDEX idx_pm_conv_time (conv_key, is_deleted, created_at DESC, msg_uuid DESC)
+                        ''')
+
+                    # 旧版本在 user 上建有 idx_user_public：按主键点查本就只走聚簇索引，
+                    # 该索引只增加写入时的维护开销，已存在则删除
+                    await cursor.execute('''
+                        SELECT 1 FROM information_schema.statistics
+                        WHERE table_schema = DATABASE() AND table_name = 'user' AND index_name = 'idx_user_public'
+                        LIMIT 1
+                    ''')
+                    if await cursor.fetchone() is not None:
+                        await cursor.execute('ALTER TABLE user DROP INDEX idx_user_public')
+        except BaseException as e:
+            # 初始化失败时唤醒等待者并允许之后重试
+            self._ready = None
+            ready.set_exception(e)
+            # 失败原因已向本调用方抛出，避免无人等待时的未取回异常警告
+            ready.exception()
+            raise
+
+        self._initialized = True
+        self.get_connection = self._acquire_connection
+        self._start_batcher()
+        ready.set_result(None)
+        self.logger.info("异步MySQL数据库已初始化于 %s:%s/%s", self.host, self.port, self.database)
 
     @asynccontextmanager
     async def get_connection(self) -> AsyncContextManager:
         """
         获取数据库连接的异步上下文管理器。
         使用连接池获取连接，确保高性能和线程安全。
+        只在初始化完成前使用：init_database 完成后会以实例属性
+        self.get_connection = self._acquire_connection 覆盖本方法，之后的调用不再检查初始化状态。
         """
-        if not self._initialized:
-            await self.init_database()
-
-        if self._pool is None:
-            await self._create_pool()
+        await self.init_database()
+        async with self._acquire_connection() as conn:
+            yield conn
 
-        conn = None
+    @asynccontextmanager
+    async def _acquire_connection(self) -> AsyncContextManager:
+        """从连接池借出连接，不检查初始化状态"""
+        loop = asyncio.get_running_loop()
+        # 获取失败时没有需要回滚或归还的连接，因此放在 try 之外
+        conn = await self._pool.acquire()
         try:
-            conn = await self._pool.acquire()
+            # 归还时记录时间；新建的连接没有该属性，无需 ping
+            last_used = getattr(conn, '_last_used', None)
+            if last_used is not None and loop.time() - last_used > self.ping_interval:
+                await conn.ping(reconnect=True)
             yield conn
-        except Exception as e:
-            if conn:
+        except Exception:
+            # 自动提交模式下只有显式开启的事务需要回滚；异常由调用方（_db_op）记录
+            if not conn.closed and conn.get_transaction_status():
                 await conn.rollback()
-            self.logger.error(f"异步MySQL数据库操作失败: {e}")
             raise
         finally:
-            if conn:
-                self._pool.release(conn)
+            conn._last_used = loop.time()
+            # release 返回的 Future 需要等待，连接被关闭或唤醒等待者时才能正确完成
+            await self._pool.release(conn)
 
+    @_db_op("异步MySQL事务", False)
     async def execute_transaction(self, operations: List[tuple]) -> bool:
         """
         在单个事务中异步执行多个SQL操作。
+        相邻且 SQL 相同的操作合并为一次 executemany，INSERT ... VALUES 会被改写为单条多行 INSERT。
 
         Args:
-            operations (List[tuple]): 一个操作列表，每个元素是一个 (sql, params) 的元组。
+            operations (List[tuple]): 一个操作列表，每个元素是一个 (sql, params) 的元组。参数中的 UUID 需先用 _pack 转为字节。
 
         Returns:
             bool: 成功返回 True，失败返回 False。
         """
+        # 出错时由 get_connection 回滚事务
         async with self.get_connection() as conn:
-            try:
-                await conn.begin()
-                async with conn.cursor() as cursor:
-                    for sql, params in operations:
-                        await cursor.execute(sql, params or ())
-                await conn.commit()
-                return True
-            except Exception as e:
-                await conn.rollback()
-                self.logger.error(f"异步MySQL事务失败: {e}")
-                return False
+            await conn.begin()
+            async with conn.cursor() as cursor:
+                for sql, group in itertools.groupby(operations, key=lambda op: op[0]):
+                    params_seq = [params or () for _, params in group]
+                    if len(params_seq) == 1:
+                        await cursor.execute(sql, params_seq[0])
+                    else:
+                        await cursor.executemany(sql, params_seq)
+            await conn.commit()
+            return True
+
+    @_db_op("异步MySQL批量执行", -1)
+    async def execute_many(self, sql: str, params_seq: List[tuple]) -> int:
+        """
+        在单个事务中用同一条SQL批量执行多组参数。
+
+        Args:
+            sql (str): 要执行的SQL语句。
+            params_seq (List[tuple]): 参数元组列表。参数中的 UUID 需先用 _pack 转为字节。
+
+        Returns:
+            int: 受影响的行数，失败返回 -1。
+        """
+        if not params_seq:
+            return 0
+
+        async with self.get_connection() as conn:
+            await conn.begin()
+            async with conn.cursor() as cursor:
+                # INSERT ... VALUES 语句会被改写为单条多行 INSERT
+                affected = await cursor.executemany(sql, params_seq)
+            await conn.commit()
+            return affected
 
     async def get_database_info(self) -> dict:
         """
         异步获取数据库的元信息，如大小和表中的行数。
+        行数取自 information_schema.tables.TABLE_ROWS，对 InnoDB 为统计估算值，
+        一次查询即可得到全部表的信息，不对每张表执行 COUNT(*) 全表扫描。
 
         Returns:
             dict: 包含数据库信息的字典。
         """
         async with self.get_connection() as conn:
             async with conn.cursor() as cursor:
-                # 获取数据库大小
                 await cursor.execute('''
-                    SELECT ROUND(SUM(data_length + index_length) / 1024 / 1024, 1) AS db_size_mb
-                    FROM information_schema.tables 
-                    WHERE table_schema = %s
-                ''', (self.database,))
-                result = await cursor.fetchone()
-                db_size = result[0] if result and result[0] else 0
-
-                # 获取所有表名
-                await cursor.execute('''
-                    SELECT table_name 
+                    SELECT table_name, table_rows, data_length + index_length
                     FROM information_schema.tables 
                     WHERE table_schema = %s AND table_type = 'BASE TABLE'
                 ''', (self.database,))
-                tables = [row[0] for row in await cursor.fetchall()]
+                rows = await cursor.fetchall()
 
-                # 获取每个表的记录数
-                table_info = {}
-                for table in tables:
-                    await cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    result = await cursor.fetchone()
-                    table_info[table] = result[0] if result else 0
+                table_info = {name: table_rows or 0 for name, table_rows, _ in rows}
+                db_size = round(sum(size or 0 for _, _, size in rows) / 1024 / 1024, 1)
 
                 return {
                     'database_size_mb': db_size,
                     'tables': table_info
                 }
 
+    @_db_op("数据库 ANALYZE", list)
+    async def analyze_database(self, max_age_hours: int = 24) -> List[str]:
+        """
+        更新统计信息以帮助查询优化器选择索引。
+        只分析统计信息超过 max_age_hours 小时未更新的表，并在一条 ANALYZE TABLE 中完成，
+        不对所有表逐个执行。需要对 mysql.innodb_table_stats 的查询权限。
+
+        Args:
+            max_age_hours (int): 统计信息的最长有效时间（小时）。
+
+        Returns:
+            List[str]: 本次分析的表名列表。
+        """
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('''
+                    SELECT table_name FROM mysql.innodb_table_stats
+                    WHERE database_name = %s AND last_update < NOW() - INTERVAL %s HOUR
+                ''', (self.database, max_age_hours))
+                tables = [row[0] for row in await cursor.fetchall()]
+                if not tables:
+                    return []
+
+                self.logger.info("开始数据库 ANALYZE: %s", ', '.join(tables))
+                # 表名来自系统表而非用户输入，仍按标识符规则加反引号转义
+                await cursor.execute('ANALYZE TABLE ' + ', '.join(
+                    '`' + table.replace('`', '``') + '`' for table in tables
+                ))
+                await cursor.fetchall()
+                self.logger.info("数据库 ANALYZE 完成。")
+                return tables
+
+    @staticmethod
+    def _seek_params(before: Optional[Tuple[int, str]]) -> tuple:
+        """键集分页条件的参数：只取排在 before=(created_at, msg_uuid) 之后的行，与 _seek_variants 生成的第二个版本配合使用"""
+        if before is None:
+            return ()
+        return before[0], _pack(before[1])
+
+    def _cache_get(self, cache: collections.OrderedDict, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存条目，过期则删除；返回副本，调用方修改不会影响缓存"""
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._cache_evict(cache, key)
+            return None
+        cache.move_to_end(key)
+        return dict(value)
+
+    def _cache_put(self, cache: collections.OrderedDict, key: str, value: Dict[str, Any]):
+        """写入缓存条目，超出容量时淘汰最久未使用的条目"""
+        if self.user_cache_size <= 0:
+            return
+        cache[key] = (time.monotonic() + self.user_cache_ttl, dict(value))
+        cache.move_to_end(key)
+        if cache is self._user_qq_cache:
+            self._user_qq_keys[value['user_uuid']] = key
+        if len(cache) > self.user_cache_size:
+            self._cache_evict(cache, next(iter(cache)))
+
+    def _cache_evict(self, cache: collections.OrderedDict, key: str):
+        """删除缓存条目，同时维护 QQ 号缓存的反查表"""
+        _, value = cache.pop(key)
+        if cache is self._user_qq_cache:
+            self._user_qq_keys.pop(value['user_uuid'], None)
+
+    def _invalidate_user(self, user_uuid: str):
+        """使指定用户在两个缓存中的条目失效"""
+        user_uuid = user_uuid.lower()
+        self._user_cache.pop(user_uuid, None)
+        qq_number = self._user_qq_keys.pop(user_uuid, None)
+        if qq_number is not None:
+            self._user_qq_cache.pop(qq_number, None)
+
     # --- 业务逻辑方法 ---
 
+    @_db_op("创建用户", "")
     async def create_user(self, user_data: Dict[str, Any]) -> str:
         """
         异步创建用户。
@@ -316,37 +638,26 @@ class AsyncMySQLDB(AbstractAsyncDB):
         Returns:
             str: 创建的用户UUID，失败则返回空字符串。
         """
-        user_uuid = str(uuid.uuid4())
-        current_timestamp = int(datetime.now(UTC).timestamp())
-
-        try:
-            async with self.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute('''
-                        INSERT INTO user (user_uuid, qq_number, name, avatar_path, role, 
-                                        password_hash, inviter, created_at, updated_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ''', (
-                        user_uuid,
-                        user_data.get('qq_number'),
-                        user_data.get('name'),
-                        user_data.get('avatar_path'),
-                        user_data.get('role', 'user'),
-                        user_data.get('password_hash'),
-                        user_data.get('inviter'),
-                        current_timestamp,
-                        current_timestamp
-                    ))
-                await conn.commit()
-                self.logger.info(f"用户创建成功: {user_uuid}")
-                return user_uuid
-        except Exception as e:
-            self.logger.error(f"创建用户失败: {e}")
-            return ""
+        user_uuid = _next_uuid()
 
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_INSERT_USER, (
+                    user_uuid.bytes,
+                    user_data.get('qq_number'),
+                    user_data.get('name'),
+                    user_data.get('avatar_path'),
+                    user_data.get('role', 'user'),
+                    user_data.get('password_hash'),
+                    _pack(user_data.get('inviter'))
+                ))
+            self.logger.info("用户创建成功: %s", user_uuid)
+            return str(user_uuid)
+
+    @_db_op("获取用户")
     async def get_user_by_uuid(self, user_uuid: str) -> Optional[Dict[str, Any]]:
         """
-        异步根据UUID获取用户信息。
+        异步根据UUID获取用户信息，优先读取缓存。
 
         Args:
             user_uuid (str): 用户UUID。
@@ -354,42 +665,82 @@ class AsyncMySQLDB(AbstractAsyncDB):
         Returns:
             Optional[Dict[str, Any]]: 用户信息字典，不存在则返回None。
         """
-        try:
-            async with self.get_connection() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await cursor.execute(
-                        'SELECT * FROM user WHERE user_uuid = %s AND is_active = 1',
-                        (user_uuid,)
-                    )
-                    row = await cursor.fetchone()
-                    return dict(row) if row else None
-        except Exception as e:
-            self.logger.error(f"获取用户失败: {e}")
+        # 以规范的小写形式作为键，大小写不同的同一 UUID 共用缓存条目
+        cached = self._cache_get(self._user_cache, user_uuid.lower())
+        if cached is not None:
+            return cached
+
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_SELECT_USER_BY_UUID, (_pack(user_uuid),))
+                row = await cursor.fetchone()
+        if row is None:
             return None
+        user = _to_dict(USER_COLS, row)
+        self._cache_put(self._user_cache, user['user_uuid'], user)
+        return user
 
+    @_db_op("获取用户（通过QQ号）")
     async def get_user_by_qq_number(self, qq_number: str) -> Optional[Dict[str, Any]]:
         """
-        异步根据QQ号获取用户信息。
+        异步根据QQ号获取用户信息，优先读取缓存。
 
         Args:
             qq_number (str): 用户的QQ号。
 
         Returns:
-            Optional[Dict[str, Any]]: 用户信息字典，如果用户不存在或不活跃则返回None。
+            Optional[Dict[str, Any]]: 用户信息字典（登录所需的 user_uuid, qq_number, name, avatar_path,
+            role, password_hash, is_active），如果用户不存在或不活跃则返回None。
         """
-        try:
-            async with self.get_connection() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await cursor.execute(
-                        'SELECT * FROM user WHERE qq_number = %s AND is_active = 1',
-                        (qq_number,)
-                    )
-                    row = await cursor.fetchone()
-                    return dict(row) if row else None
-        except Exception as e:
-            self.logger.error(f"获取用户（通过QQ号）失败: {e}")
+        cached = self._cache_get(self._user_qq_cache, qq_number)
+        if cached is not None:
+            return cached
+
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_SELECT_USER_BY_QQ, (qq_number,))
+                row = await cursor.fetchone()
+        if row is None:
             return None
+        user = _to_dict(USER_LOGIN_COLS, row)
+        self._cache_put(self._user_qq_cache, qq_number, user)
+        return user
+
+    @_db_op("获取用户公开信息")
+    async def get_user_public(self, user_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        异步获取用户的公开信息（不含密码哈希和审计字段）。
+
+        Args:
+            user_uuid (str): 用户UUID。
+
+        Returns:
+            Optional[Dict[str, Any]]: 用户公开信息字典，不存在则返回None。
+        """
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_SELECT_USER_PUBLIC, (_pack(user_uuid),))
+                row = await cursor.fetchone()
+                return _to_dict(USER_PUBLIC_COLS, row) if row else None
+
+    @_db_op("获取用户认证信息")
+    async def get_user_auth(self, user_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        异步获取用户的认证信息。
 
+        Args:
+            user_uuid (str): 用户UUID。
+
+        Returns:
+            Optional[Dict[str, Any]]: 包含 user_uuid, role, password_hash 的字典，不存在则返回None。
+        """
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_SELECT_USER_AUTH, (_pack(user_uuid),))
+                row = await cursor.fetchone()
+                return _to_dict(USER_AUTH_COLS, row) if row else None
+
+    @_db_op("更新用户", False)
     async def update_user(self, user_uuid: str, update_data: Dict[str, Any]) -> bool:
         """
         异步更新用户信息。
@@ -404,28 +755,32 @@ class AsyncMySQLDB(AbstractAsyncDB):
         if not update_data:
             return False
 
-        # 添加updated_at时间戳
-        update_data['updated_at'] = int(datetime.now(UTC).timestamp())
+        # 连接启用了多语句，字段名直接拼接进 SQL，必须限制在已知列内
+        unknown_fields = update_data.keys() - _USER_UPDATABLE_FIELDS
+        if unknown_fields:
+            self.logger.error("更新用户失败: 不允许更新的字段 %s", sorted(unknown_fields))
+            return False
+
+        if 'inviter' in update_data:
+            update_data['inviter'] = _pack(update_data['inviter'])
 
         # 构建动态SQL
         fields = list(update_data.keys())
         values = list(update_data.values())
-        values.append(user_uuid)  # WHERE条件的值
+        values.append(_pack(user_uuid))  # WHERE条件的值
 
-        set_clause = ', '.join([f"{field} = %s" for field in fields])
+        # updated_at 由数据库生成
+        set_clause = ', '.join([f"{field} = %s" for field in fields] + ['updated_at = UNIX_TIMESTAMP()'])
         sql = f"UPDATE user SET {set_clause} WHERE user_uuid = %s"
 
-        try:
-            async with self.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute(sql, values)
-                await conn.commit()
-                self.logger.info(f"用户更新成功: {user_uuid}")
-                return True
-        except Exception as e:
-            self.logger.error(f"更新用户失败: {e}")
-            return False
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, values)
+            self._invalidate_user(user_uuid)
+            self.logger.info("用户更新成功: %s", user_uuid)
+            return True
 
+    @_db_op("创建房间", "")
     async def create_room(self, room_data: Dict[str, Any]) -> str:
         """
         异步创建房间。
@@ -436,46 +791,34 @@ class AsyncMySQLDB(AbstractAsyncDB):
         Returns:
             str: 创建的房间UUID，失败则返回空字符串。
         """
-        room_uuid = str(uuid.uuid4())
-        current_timestamp = int(datetime.now(UTC).timestamp())
-
-        try:
-            async with self.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    # 创建房间
-                    await cursor.execute('''
-                        INSERT INTO room (room_uuid, name, description, avatar_path, 
-                                        max_online_users, max_join_users, creator, 
-                                        created_at, updated_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ''', (
-                        room_uuid,
-                        room_data.get('name'),
-                        room_data.get('description'),
-                        room_data.get('avatar_path'),
-                        room_data.get('max_online_users', 100),
-                        room_data.get('max_join_users', 500),
-                        room_data.get('creator'),
-                        current_timestamp,
-                        current_timestamp
-                    ))
-
-                    # 将创建者添加为房间所有者
-                    await cursor.execute('''
-                        INSERT INTO user_room (user_uuid, room_uuid, role, joined_at)
-                        VALUES (%s, %s, 'owner', %s)
-                    ''', (room_data.get('creator'), room_uuid, current_timestamp))
+        room_uuid = _next_uuid()
+        creator = _pack(room_data.get('creator'))
 
-                await conn.commit()
-                self.logger.info(f"房间创建成功: {room_uuid}")
-                return room_uuid
-        except Exception as e:
-            self.logger.error(f"创建房间失败: {e}")
-            return ""
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                # 创建房间并将创建者添加为房间所有者，两条 INSERT 连同事务控制语句
+                # 作为一条多语句请求发送，一次往返完成；任一语句失败时后续语句不会执行
+                await cursor.execute(_SQL_CREATE_ROOM, (
+                    room_uuid.bytes,
+                    room_data.get('name'),
+                    room_data.get('description'),
+                    room_data.get('avatar_path'),
+                    room_data.get('max_online_users', 100),
+                    room_data.get('max_join_users', 500),
+                    creator,
+                    creator,
+                    room_uuid.bytes
+                ))
+                while await cursor.nextset():
+                    pass
+
+            self.logger.info("房间创建成功: %s", room_uuid)
+            return str(room_uuid)
 
     async def send_message(self, message_data: Dict[str, Any]) -> str:
         """
         异步发送消息到房间。
+        消息进入合批队列，由后台任务与同一时间窗口内的其他消息一起写入。
 
         Args:
             message_data (Dict[str, Any]): 消息数据字典。
@@ -483,63 +826,201 @@ class AsyncMySQLDB(AbstractAsyncDB):
         Returns:
             str: 创建的消息UUID，失败则返回空字符串。
         """
-        msg_uuid = str(uuid.uuid4())
-        current_timestamp = int(datetime.now(UTC).timestamp())
+        if self._batcher_task is None:
+            # 合批任务在 init_database 完成时启动
+            try:
+                await self.init_database()
+            except Exception as e:
+                self.logger.error("发送消息失败: %s", e)
+                return ""
+        elif self._batcher_task.done():
+            # 任务意外退出时重新启动，沿用同一个队列
+            self._start_batcher()
+
+        future = asyncio.get_running_loop().create_future()
+        self._message_queue.put_nowait((message_data, future))
+        return await future
+
+    def _start_batcher(self):
+        """启动后台合批任务；close 时向队列发送 None 让其写完剩余消息后退出"""
+        if self._message_queue is None:
+            self._message_queue = asyncio.Queue()
+        self._batcher_task = asyncio.create_task(self._message_batcher())
+
+    async def _message_batcher(self):
+        """
+        后台合批任务：取到第一条消息后，如果队列中还有消息在排队，则继续收集直到凑满 batch_max_size 条
+        或超过 batch_max_delay 秒；没有其他消息时立即写入，单条消息不等待时间窗口。
+        写入通过 send_messages_bulk 完成并通知各调用方；取到 None 时写完已收集的消息后退出。
+        """
+        queue = self._message_queue
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                return
+            batch = [item]
+            try:
+                deadline = loop.time() + self.batch_max_delay
+                while len(batch) < self.batch_max_size:
+                    if not queue.empty():
+                        item = queue.get_nowait()
+                    elif len(batch) == 1:
+                        # 没有其他消息在排队，直接写入
+                        break
+                    else:
+                        # 消息正在连续到达，在时间窗口内继续收集
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        try:
+                            item = await asyncio.wait_for(queue.get(), timeout)
+                        except asyncio.TimeoutError:
+                            break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                msg_uuids = await self.send_messages_bulk([message_data for message_data, _ in batch])
+                for i, (_, future) in enumerate(batch):
+                    if not future.done():
+                        future.set_result(msg_uuids[i] if msg_uuids else "")
+            finally:
+                # 任务被取消或出现意外异常时，不让调用方永远等待
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result("")
+
+    @_db_op("批量发送消息", list)
+    async def send_messages_bulk(self, messages: List[Dict[str, Any]]) -> List[str]:
+        """
+        在单个事务中批量写入房间消息，使用多行 INSERT ... VALUES (...), (...)。
 
-        try:
-            async with self.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute('''
-                        INSERT INTO message (msg_uuid, sender, msg_type, content, room_uuid, 
-                                           reply_to, file_path, file_size, created_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ''', (
-                        msg_uuid,
-                        message_data.get('sender'),
-                        message_data.get('msg_type', 'text'),
-                        message_data.get('content'),
-                        message_data.get('room_uuid'),
-                        message_data.get('reply_to'),
-                        message_data.get('file_path'),
-                        message_data.get('file_size'),
-                        current_timestamp
-                    ))
-                await conn.commit()
-                self.logger.info(f"消息发送成功: {msg_uuid}")
-                return msg_uuid
-        except Exception as e:
-            self.logger.error(f"发送消息失败: {e}")
-            return ""
+        Args:
+            messages (List[Dict[str, Any]]): 消息数据字典列表。
 
-    async def get_room_messages(self, room_uuid: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        Returns:
+            List[str]: 与输入顺序一致的消息UUID列表，失败则返回空列表。
+        """
+        if not messages:
+            return []
+
+        msg_uuids = [_next_uuid() for _ in messages]
+        rows = [(
+            msg_uuid.bytes,
+            _pack(message_data.get('sender')),
+            message_data.get('msg_type', 'text'),
+            message_data.get('content'),
+            _pack(message_data.get('room_uuid')),
+            _pack(message_data.get('reply_to')),
+            message_data.get('file_path'),
+            message_data.get('file_size')
+        ) for msg_uuid, message_data in zip(msg_uuids, messages)]
+
+        async with self.get_connection() as conn:
+            await conn.begin()
+            async with conn.cursor() as cursor:
+                for start in range(0, len(rows), self.bulk_chunk_size):
+                    chunk = rows[start:start + self.bulk_chunk_size]
+                    sql = _MESSAGE_INSERT_PREFIX + ', '.join([_MESSAGE_ROW_PLACEHOLDER] * len(chunk))
+                    await cursor.execute(sql, [value for row in chunk for value in row])
+            await conn.commit()
+            self.logger.info("批量发送消息成功: %s 条", len(msg_uuids))
+            return [str(msg_uuid) for msg_uuid in msg_uuids]
+
+    @_db_op("获取房间消息", list)
+    async def get_room_messages(self, room_uuid: str, limit: int = 50,
+                                before: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
         """
-        异步获取房间消息（分页）。
+        异步获取房间消息（键集分页）。
 
         Args:
             room_uuid (str): 房间UUID。
-            limit (int): 每页消息数量。
-            offset (int): 偏移量。
+            limit (int): 每页消息数量，最多 _MAX_PAGE_SIZE 条。
+            before (Optional[Tuple[int, str]]): 上一页最后一条消息的 (created_at, msg_uuid)。
 
         Returns:
             List[Dict[str, Any]]: 消息列表。
         """
+        limit = min(limit, _MAX_PAGE_SIZE)
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_ROOM_MESSAGES[before is not None],
+                                     (_pack(room_uuid), *self._seek_params(before), limit))
+                rows = await cursor.fetchall()
+                return [_to_dict(MESSAGE_COLS, row) for row in rows]
+
+    async def iter_room_messages(self, room_uuid: str, limit: Optional[int] = None,
+                                 before: Optional[Tuple[int, str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        以流的方式逐条获取房间消息（键集分页顺序），适用于导出历史记录等大结果集。
+        使用服务端游标 SSCursor，行在到达时即被产出，内存占用与结果集大小无关；
+        迭代期间会一直占用一个连接，消费方应尽快处理或提前退出迭代。
+
+        Args:
+            room_uuid (str): 房间UUID。
+            limit (Optional[int]): 最多返回的消息数量，为 None 时不限制。
+            before (Optional[Tuple[int, str]]): 只返回排在 (created_at, msg_uuid) 之后的消息。
+
+        Yields:
+            Dict[str, Any]: 消息字典，字段与 get_room_messages 相同。
+        """
+        params = (_pack(room_uuid), *self._seek_params(before))
+        if limit is None:
+            sql = _SQL_ROOM_MESSAGES_ALL[before is not None]
+        else:
+            sql, params = _SQL_ROOM_MESSAGES[before is not None], (*params, limit)
         try:
             async with self.get_connection() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await cursor.execute('''
-                        SELECT m.*, u.name as sender_name, u.avatar_path as sender_avatar
-                        FROM message m
-                        LEFT JOIN user u ON m.sender = u.user_uuid
-                        WHERE m.room_uuid = %s AND m.is_deleted = 0
-                        ORDER BY m.created_at DESC
-                        LIMIT %s OFFSET %s
-                    ''', (room_uuid, limit, offset))
-                    rows = await cursor.fetchall()
-                    return [dict(row) for row in rows]
+                async with conn.cursor(aiomysql.SSCursor) as cursor:
+                    await cursor.execute(sql, params)
+                    async for row in cursor:
+                        yield _to_dict(MESSAGE_COLS, row)
         except Exception as e:
-            self.logger.error(f"获取房间消息失败: {e}")
-            return []
+            self.logger.error("流式获取房间消息失败: %s", e)
+
+    @_db_op("获取房间消息摘要", list)
+    async def get_room_message_summaries(self, room_uuid: str, limit: int = 50,
+                                         before: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
+        """
+        异步获取房间消息摘要（键集分页），查询只涉及 idx_message_room_active 中的列。
+
+        Args:
+            room_uuid (str): 房间UUID。
+            limit (int): 每页消息数量，最多 _MAX_PAGE_SIZE 条。
+            before (Optional[Tuple[int, str]]): 上一页最后一条消息的 (created_at, msg_uuid)。
 
+        Returns:
+            List[Dict[str, Any]]: 消息摘要列表。
+        """
+        limit = min(limit, _MAX_PAGE_SIZE)
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_ROOM_MESSAGE_SUMMARIES[before is not None],
+                                     (_pack(room_uuid), *self._seek_params(before), limit))
+                rows = await cursor.fetchall()
+                return [_to_dict(MESSAGE_SUMMARY_COLS, row) for row in rows]
+
+    @_db_op("获取消息")
+    async def get_message(self, msg_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        异步根据UUID获取单条房间消息。
+
+        Args:
+            msg_uuid (str): 消息UUID。
+
+        Returns:
+            Optional[Dict[str, Any]]: 消息字典，不存在则返回None。
+        """
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_GET_MESSAGE, (_pack(msg_uuid),))
+                row = await cursor.fetchone()
+                return _to_dict(MESSAGE_COLS, row) if row else None
+
+    @_db_op("发送私聊消息", "")
     async def send_private_message(self, message_data: Dict[str, Any]) -> str:
         """
         异步发送私聊消息
@@ -550,34 +1031,24 @@ class AsyncMySQLDB(AbstractAsyncDB):
         Returns:
             str: 创建的消息UUID，失败则返回空字符串
         """
-        msg_uuid = str(uuid.uuid4())
-        current_timestamp = int(datetime.now(UTC).timestamp())
-
-        try:
-            async with self.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute('''
-                        INSERT INTO private_message (msg_uuid, sender_uuid, receiver_uuid, msg_type, content, 
-                                                   reply_to, file_path, file_size, created_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ''', (
-                        msg_uuid,
-                        message_data.get('sender_uuid'),
-                        message_data.get('receiver_uuid'),
-                        message_data.get('msg_type', 'text'),
-                        message_data.get('content'),
-                        message_data.get('reply_to'),
-                        message_data.get('file_path'),
-                        message_data.get('file_size'),
-                        current_timestamp
-                    ))
-                await conn.commit()
-                self.logger.info(f"私聊消息发送成功: {msg_uuid}")
-                return msg_uuid
-        except Exception as e:
-            self.logger.error(f"发送私聊消息失败: {e}")
-            return ""
+        msg_uuid = _next_uuid()
 
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_INSERT_PM, (
+                    msg_uuid.bytes,
+                    _pack(message_data.get('sender_uuid')),
+                    _pack(message_data.get('receiver_uuid')),
+                    message_data.get('msg_type', 'text'),
+                    message_data.get('content'),
+                    _pack(message_data.get('reply_to')),
+                    message_data.get('file_path'),
+                    message_data.get('file_size')
+                ))
+            self.logger.info("私聊消息发送成功: %s", msg_uuid)
+            return str(msg_uuid)
+
+    @_db_op("获取私聊用户列表", list)
     async def get_private_message_users(self, user_uuid: str) -> List[str]:
         """
         获取与该用户有私聊记录的用户
@@ -588,59 +1059,68 @@ class AsyncMySQLDB(AbstractAsyncDB):
         Returns:
             List[str]: 对应的用户UUID列表
         """
-        try:
-            async with self.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute('''
-                        SELECT DISTINCT receiver_uuid AS user_uuid 
-                        FROM private_message 
-                        WHERE sender_uuid = %s
-                        UNION
-                        SELECT DISTINCT sender_uuid AS user_uuid 
-                        FROM private_message 
-                        WHERE receiver_uuid = %s
-                    ''', (user_uuid, user_uuid))
-                    rows = await cursor.fetchall()
-                    return [row[0] for row in rows]
-        except Exception as e:
-            self.logger.error(f"获取私聊用户列表失败: {e}")
-            return []
-
-    async def get_private_messages(self, user_uuid1: str, user_uuid2: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        user_uuid_bytes = _pack(user_uuid)
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                # 单次查询：sender_uuid / receiver_uuid 分别由 idx_pm_sender_receiver 和
+                # idx_pm_receiver_sender 的前缀覆盖，可走 index merge 且无需回表
+                await cursor.execute(_SQL_PRIVATE_MESSAGE_USERS, (user_uuid_bytes, user_uuid_bytes, user_uuid_bytes))
+                rows = await cursor.fetchall()
+                return [_unpack(row[0]) for row in rows]
+
+    @_db_op("获取私聊消息", list)
+    async def get_private_messages(self, user_uuid1: str, user_uuid2: str, limit: int = 50,
+                                   before: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
         """
-        异步获取私聊消息（分页）
+        异步获取私聊消息（键集分页），按 conv_key 在 idx_pm_conv_time 上做单个区间扫描
 
         Args:
             user_uuid1: 用户1 UUID
             user_uuid2: 用户2 UUID
-            limit: 每页消息数量，默认50
-            offset: 偏移量，默认0
+            limit: 每页消息数量，默认50，最多 _MAX_PAGE_SIZE 条
+            before: 上一页最后一条消息的 (created_at, msg_uuid)，为 None 时返回最新一页
 
         Returns:
             List[Dict[str, Any]]: 私聊消息列表，每个消息包含详细信息
         """
+        limit = min(limit, _MAX_PAGE_SIZE)
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_PRIVATE_MESSAGES[before is not None],
+                                     (_conv_key(user_uuid1, user_uuid2), *self._seek_params(before), limit))
+                rows = await cursor.fetchall()
+                return [_to_dict(PRIVATE_MESSAGE_COLS, row) for row in rows]
+
+    async def iter_private_messages(self, user_uuid1: str, user_uuid2: str, limit: Optional[int] = None,
+                                    before: Optional[Tuple[int, str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        以流的方式逐条获取两个用户之间的私聊消息，顺序与 get_private_messages 相同。
+        使用服务端游标 SSCursor，迭代期间会一直占用一个连接。
+
+        Args:
+            user_uuid1: 用户1 UUID
+            user_uuid2: 用户2 UUID
+            limit: 最多返回的消息数量，为 None 时不限制
+            before: 只返回排在 (created_at, msg_uuid) 之后的消息
+
+        Yields:
+            Dict[str, Any]: 私聊消息字典，字段与 get_private_messages 相同
+        """
+        params = (_conv_key(user_uuid1, user_uuid2), *self._seek_params(before))
+        if limit is None:
+            sql = _SQL_PRIVATE_MESSAGES_ALL[before is not None]
+        else:
+            sql, params = _SQL_PRIVATE_MESSAGES[before is not None], (*params, limit)
         try:
             async with self.get_connection() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await cursor.execute('''
-                        SELECT pm.*, 
-                               s.name AS sender_name, s.avatar_path AS sender_avatar,
-                               r.name AS receiver_name, r.avatar_path AS receiver_avatar
-                        FROM private_message pm
-                        LEFT JOIN user s ON pm.sender_uuid = s.user_uuid
-                        LEFT JOIN user r ON pm.receiver_uuid = r.user_uuid
-                        WHERE (pm.sender_uuid = %s AND pm.receiver_uuid = %s) 
-                           OR (pm.sender_uuid = %s AND pm.receiver_uuid = %s)
-                        AND pm.is_deleted = 0
-                        ORDER BY pm.created_at DESC
-                        LIMIT %s OFFSET %s
-                    ''', (user_uuid1, user_uuid2, user_uuid2, user_uuid1, limit, offset))
-                    rows = await cursor.fetchall()
-                    return [dict(row) for row in rows]
+                async with conn.cursor(aiomysql.SSCursor) as cursor:
+                    await cursor.execute(sql, params)
+                    async for row in cursor:
+                        yield _to_dict(PRIVATE_MESSAGE_COLS, row)
         except Exception as e:
-            self.logger.error(f"获取私聊消息失败: {e}")
-            return []
+            self.logger.error("流式获取私聊消息失败: %s", e)
 
+    @_db_op("用户加入房间", False)
     async def join_room(self, user_uuid: str, room_uuid: str) -> bool:
         """
         异步用户加入房间。
@@ -652,24 +1132,13 @@ class AsyncMySQLDB(AbstractAsyncDB):
         Returns:
             bool: 加入成功返回True，失败返回False。
         """
-        current_timestamp = int(datetime.now(UTC).timestamp())
-
-        try:
-            async with self.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute('''
-                        INSERT INTO user_room (user_uuid, room_uuid, role, joined_at, left_at)
-                        VALUES (%s, %s, 'member', %s, NULL)
-                        ON DUPLICATE KEY UPDATE 
-                        joined_at = %s, left_at = NULL
-                    ''', (user_uuid, room_uuid, current_timestamp, current_timestamp))
-                await conn.commit()
-                self.logger.info(f"用户 {user_uuid} 成功加入房间 {room_uuid}")
-                return True
-        except Exception as e:
-            self.logger.error(f"用户加入房间失败: {e}")
-            return False
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_JOIN_ROOM, (_pack(user_uuid), _pack(room_uuid)))
+            self.logger.info("用户 %s 成功加入房间 %s", user_uuid, room_uuid)
+            return True
 
+    @_db_op("用户退出房间", False)
     async def leave_room(self, user_uuid: str, room_uuid: str) -> bool:
         """
         异步用户退出房间。
@@ -681,32 +1150,38 @@ class AsyncMySQLDB(AbstractAsyncDB):
         Returns:
             bool: 退出成功返回True，失败返回False。
         """
-        current_timestamp = int(datetime.now(UTC).timestamp())
-
-        try:
-            async with self.get_connection() as conn:
-                async with conn.cursor() as cursor:
-                    await cursor.execute('''
-                        UPDATE user_room 
-                        SET left_at = %s 
-                        WHERE user_uuid = %s AND room_uuid = %s AND left_at IS NULL
-                    ''', (current_timestamp, user_uuid, room_uuid))
-                await conn.commit()
-                self.logger.info(f"用户 {user_uuid} 成功退出房间 {room_uuid}")
-                return True
-        except Exception as e:
-            self.logger.error(f"用户退出房间失败: {e}")
-            return False
+        async with self.get_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(_SQL_LEAVE_ROOM, (_pack(user_uuid), _pack(room_uuid)))
+            self.logger.info("用户 %s 成功退出房间 %s", user_uuid, room_uuid)
+            return True
 
     async def close(self):
         """
         关闭数据库连接池
         """
+        if self._batcher_task is not None:
+            # 在连接池关闭前让合批任务写完队列中已有的消息
+            if not self._batcher_task.done():
+                self._message_queue.put_nowait(None)
+            await asyncio.gather(self._batcher_task, return_exceptions=True)
+            self._batcher_task = None
+            # 关闭过程中才到达的消息按失败处理
+            while not self._message_queue.empty():
+                item = self._message_queue.get_nowait()
+                if item is not None and not item[1].done():
+                    item[1].set_result("")
+            self._message_queue = None
+
         if self._pool:
             self._pool.close()
             await self._pool.wait_closed()
             self._pool = None
             self.logger.info("MySQL连接池已关闭")
+        # 关闭后再次使用时重新建立连接池
+        self.__dict__.pop('get_connection', None)
+        self._ready = None
+        self._initialized = False
 
     async def __aenter__(self):
         """异步上下文管理器入口"""
@@ -1,24 +1,83 @@
 ﻿"""app/db/sqlite/async_sqlite_.py (异步版本)"""
 
 import aiosqlite
-import uuid
+import sqlite3
 import os
 import asyncio
-from datetime import datetime, UTC
-from typing import Optional, List, Dict, Any, AsyncContextManager
+import functools
+import time
+from typing import Optional, List, Dict, Any, Tuple, AsyncContextManager
 from contextlib import asynccontextmanager
-import logging
 import threading
+from pathlib import Path
 
 from app.db.base import AbstractAsyncDB
+from app.db._uuid import pack as _pack, unpack as _unpack, next_uuid as _next_uuid
 
 
 # --- 异步最佳实践建议 ---
 # 1. 使用 aiosqlite 库进行异步SQLite操作
 # 2. 所有数据库操作都是异步的，需要使用 await 关键字
 # 3. 连接管理通过异步上下文管理器实现
+# 4. 连接在 init_database 时一次性创建并放入连接池，用完归还而不是关闭
+#    写操作共用唯一的写连接（SQLite 同一时间只允许一个写者），读操作使用只读连接池
+# 5. UUID 以 16 字节 BLOB 存储（声明类型 UUIDBLOB），对外接口仍使用字符串
+# 6. 连接以自动提交模式打开（isolation_level=None），单条写语句无需 commit，多条语句用显式事务包裹
 # ------------------------------------
 
+
+# 查询结果中声明类型为 UUIDBLOB 的列自动转换回字符串（需以 PARSE_DECLTYPES 打开连接）
+sqlite3.register_converter('UUIDBLOB', _unpack)
+
+
+def _dict_row(cursor: sqlite3.Cursor, row: tuple) -> Dict[str, Any]:
+    """
+    行工厂：直接把结果行构造成字典。
+    设置在游标上时，转换随 fetchall 在 aiosqlite 的连接线程中完成，
+    不占用事件循环，也不再为每行先创建一个 sqlite3.Row
+    """
+    return dict(zip([column[0] for column in cursor.description], row))
+
+
+# --- SQL 语句 ---
+# 各方法引用同一字符串对象，sqlite3 的语句缓存以 SQL 文本为键，可稳定命中
+_SQL_INSERT_USER = '''
+    INSERT INTO user (user_uuid, qq_number, name, avatar_path, role,
+                      password_hash, inviter, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+_SQL_UPDATE_LAST_LOGIN = 'UPDATE user SET last_login_at = ?, updated_at = ? WHERE user_uuid = ?'
+_SQL_INSERT_ROOM = '''
+    INSERT INTO room (room_uuid, name, description, avatar_path,
+                      max_online_users, max_join_users, creator,
+                      created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+_SQL_INSERT_ROOM_OWNER = '''
+    INSERT INTO user_room (user_uuid, room_uuid, role, joined_at)
+    VALUES (?, ?, 'owner', ?)'''
+_SQL_INSERT_MESSAGE = '''
+    INSERT INTO message (msg_uuid, sender, msg_type, content, room_uuid,
+                         reply_to, file_path, file_size, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+_SQL_INSERT_PM = '''
+    INSERT INTO private_message (msg_uuid, sender_uuid, receiver_uuid, msg_type, content,
+                                 reply_to, file_path, file_size, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+_SQL_JOIN_ROOM = '''
+    INSERT OR REPLACE INTO user_room (user_uuid, room_uuid, role, joined_at, left_at)
+    VALUES (?, ?, 'member', ?, NULL)'''
+_SQL_LEAVE_ROOM = '''
+    UPDATE user_room
+    SET left_at = ?
+    WHERE user_uuid = ? AND room_uuid = ? AND left_at IS NULL'''
+
+
+@functools.lru_cache(maxsize=64)
+def _build_update_sql(fields: Tuple[str, ...]) -> str:
+    """按更新列的组合生成 UPDATE 语句，常见组合（如 last_login_at, updated_at）直接复用缓存"""
+    set_clause = ', '.join(f"{field} = ?" for field in fields)
+    return f"UPDATE user SET {set_clause} WHERE user_uuid = ?"
+
+
 class AsyncSQLiteDB(AbstractAsyncDB):
     """
     一个用于管理SQLite数据库的异步类，支持高并发异步操作。
@@ -34,8 +93,14 @@ class AsyncSQLiteDB(AbstractAsyncDB):
         """
         super().__init__(db_config)
         self.db_path = db_config.get('db_path', 'chat.db')
+        self.pool_size = db_config.get('pool_size', 8)
+        # 只读连接池；写连接只有一个，放在容量为 1 的队列中保证同一时间只有一个协程持有
+        self._pool: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Queue] = None
+        # 正在替换坏连接的后台任务，持有引用防止任务被提前回收
+        self._replacing: set = set()
         self._connection_lock = asyncio.Lock()
-        self.logger.info(f"异步 SQLite 数据库将初始化于 {os.path.abspath(self.db_path)}")
+        self.logger.info("异步 SQLite 数据库将初始化于 %s", os.path.abspath(self.db_path))
 
     async def init_database(self):
         """
@@ -49,38 +114,36 @@ class AsyncSQLiteDB(AbstractAsyncDB):
             if self._initialized:
                 return
 
-            async with aiosqlite.connect(self.db_path) as conn:
-                # 启用外键支持和优化设置
-                await conn.execute('PRAGMA foreign_keys = ON')
+            # 写连接同时负责建表；aiosqlite 为每个连接维护一个专用线程和请求队列，
+            # 所有写操作因此在同一个线程上串行执行，不会互相触发 SQLITE_BUSY
+            conn = await self._open_connection()
+            try:
+                # WAL 模式写入数据库文件，只需设置一次；读写可并发进行
                 await conn.execute('PRAGMA journal_mode = WAL')
-                await conn.execute('PRAGMA synchronous = NORMAL')
-                await conn.execute('PRAGMA cache_size = -64000')
 
                 # --- 表定义 ---
                 # 与同步版本保持完全一致的表结构
-
-                # `user` 表
-                await conn.execute('''
+                # 全部建表语句作为一个脚本执行，只需一次跨线程调用
+                await conn.executescript('''
+                    -- `user` 表
                     CREATE TABLE IF NOT EXISTS user (
-                        user_uuid TEXT PRIMARY KEY,
+                        user_uuid UUIDBLOB PRIMARY KEY,
                         qq_number TEXT UNIQUE,
                         name TEXT NOT NULL,
                         avatar_path TEXT,
                         role TEXT DEFAULT 'user' CHECK (role IN ('admin', 'super_admin', 'user')),
                         password_hash TEXT,
-                        inviter TEXT,
+                        inviter UUIDBLOB,
                         is_active INTEGER DEFAULT 1,
                         last_login_at INTEGER,
                         created_at INTEGER DEFAULT (strftime('%s', 'now')),
                         updated_at INTEGER DEFAULT (strftime('%s', 'now'))
                         -- FOREIGN KEY (inviter) REFERENCES user(user_uuid) ON DELETE SET NULL
-                    )
-                ''')
+                    );
 
-                # `room` 表
-                await conn.execute('''
+                    -- `room` 表
                     CREATE TABLE IF NOT EXISTS room (
-                        room_uuid TEXT PRIMARY KEY,
+                        room_uuid UUIDBLOB PRIMARY KEY,
                         name TEXT NOT NULL,
                         description TEXT,
                         avatar_path TEXT,
@@ -89,20 +152,18 @@ class AsyncSQLiteDB(AbstractAsyncDB):
                         is_active INTEGER DEFAULT 1,
                         created_at INTEGER DEFAULT (strftime('%s', 'now')),
                         updated_at INTEGER DEFAULT (strftime('%s', 'now')),
-                        creator TEXT NOT NULL,
+                        creator UUIDBLOB NOT NULL,
                         FOREIGN KEY (creator) REFERENCES user(user_uuid) ON DELETE CASCADE
-                    )
-                ''')
+                    );
 
-                # `message` 表（用于群聊/房间聊天）
-                await conn.execute('''
+                    -- `message` 表（用于群聊/房间聊天）
                     CREATE TABLE IF NOT EXISTS message (
-                        msg_uuid TEXT PRIMARY KEY,
-                        sender TEXT NOT NULL,
+                        msg_uuid UUIDBLOB PRIMARY KEY,
+                        sender UUIDBLOB NOT NULL,
                         msg_type TEXT DEFAULT 'text' CHECK (msg_type IN ('text', 'image', 'audio', 'video', 'system', 'file')),
                         content TEXT NOT NULL,
-                        room_uuid TEXT NOT NULL,
-                        reply_to TEXT,
+                        room_uuid UUIDBLOB NOT NULL,
+                        reply_to UUIDBLOB,
                         file_path TEXT,
                         file_size INTEGER,
                         is_deleted INTEGER DEFAULT 0,
@@ -110,18 +171,16 @@ class AsyncSQLiteDB(AbstractAsyncDB):
                         FOREIGN KEY (sender) REFERENCES user(user_uuid) ON DELETE CASCADE,
                         FOREIGN KEY (room_uuid) REFERENCES room(room_uuid) ON DELETE CASCADE,
                         FOREIGN KEY (reply_to) REFERENCES message(msg_uuid) ON DELETE SET NULL
-                    )
-                ''')
+                    );
 
-                # `private_message` 表
-                await conn.execute('''
+                    -- `private_message` 表
                     CREATE TABLE IF NOT EXISTS private_message (
-                        msg_uuid TEXT PRIMARY KEY,
-                        sender_uuid TEXT NOT NULL,
-                        receiver_uuid TEXT NOT NULL,
+                        msg_uuid UUIDBLOB PRIMARY KEY,
+                        sender_uuid UUIDBLOB NOT NULL,
+                        receiver_uuid UUIDBLOB NOT NULL,
                         msg_type TEXT DEFAULT 'text' CHECK (msg_type IN ('text', 'image', 'audio', 'video', 'system', 'file')),
                         content TEXT NOT NULL,
-                        reply_to TEXT,
+                        reply_to UUIDBLOB,
                         file_path TEXT,
                         file_size INTEGER,
                         is_deleted INTEGER DEFAULT 0,
@@ -130,15 +189,15 @@ class AsyncSQLiteDB(AbstractAsyncDB):
                         FOREIGN KEY (sender_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
                         FOREIGN KEY (receiver_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
                         FOREIGN KEY (reply_to) REFERENCES private_message(msg_uuid) ON DELETE SET NULL
-                    )
-                ''')
+                    );
 
-                # `user_room` 连接表（多对多关系）
-                await conn.execute('''
+                    -- `user_room` 连接表（多对多关系）
+                    -- 两张关系表的 id 是 rowid 别名，不使用 AUTOINCREMENT，插入时无需更新 sqlite_sequence；
+                    -- 已存在的数据库保持原有定义
                     CREATE TABLE IF NOT EXISTS user_room (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_uuid TEXT NOT NULL,
-                        room_uuid TEXT NOT NULL,
+                        id INTEGER PRIMARY KEY,
+                        user_uuid UUIDBLOB NOT NULL,
+                        room_uuid UUIDBLOB NOT NULL,
                         role TEXT DEFAULT 'member' CHECK (role IN ('owner', 'admin', 'member')),
                         is_muted INTEGER DEFAULT 0,
                         joined_at INTEGER DEFAULT (strftime('%s', 'now')),
@@ -146,30 +205,48 @@ class AsyncSQLiteDB(AbstractAsyncDB):
                         FOREIGN KEY (user_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
                         FOREIGN KEY (room_uuid) REFERENCES room(room_uuid) ON DELETE CASCADE,
                         UNIQUE(user_uuid, room_uuid)
-                    )
-                ''')
+                    );
 
-                # `message_read_status` 表
-                await conn.execute('''
+                    -- `message_read_status` 表
                     CREATE TABLE IF NOT EXISTS message_read_status (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_uuid TEXT NOT NULL,
-                        message_uuid TEXT NOT NULL,
-                        room_uuid TEXT NOT NULL,
+                        id INTEGER PRIMARY KEY,
+                        user_uuid UUIDBLOB NOT NULL,
+                        message_uuid UUIDBLOB NOT NULL,
+                        room_uuid UUIDBLOB NOT NULL,
                         read_at INTEGER DEFAULT (strftime('%s', 'now')),
                         FOREIGN KEY (user_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
                         FOREIGN KEY (message_uuid) REFERENCES message(msg_uuid) ON DELETE CASCADE,
                         FOREIGN KEY (room_uuid) REFERENCES room(room_uuid) ON DELETE CASCADE,
                         UNIQUE(user_uuid, message_uuid)
-                    )
+                    );
                 ''')
 
+                # 旧版本以 TEXT 存储 UUID，与当前编码不兼容，需要先迁移数据
+                async with conn.execute(
+                        "SELECT type FROM pragma_table_info('user') WHERE name = 'user_uuid'") as cursor:
+                    row = await cursor.fetchone()
+                if row and row[0] != 'UUIDBLOB':
+                    raise RuntimeError(f"数据库 {self.db_path} 使用旧的 TEXT UUID 结构，请迁移后再启动")
+
                 # 创建索引以提升性能
                 await self._create_indexes(conn)
-                await conn.commit()
+            except BaseException:
+                await conn.close()
+                raise
+
+            writer = asyncio.Queue(maxsize=1)
+            writer.put_nowait(conn)
+            self._writer = writer
+
+            # 预先创建只读连接池
+            pool = asyncio.Queue(maxsize=self.pool_size)
+            for _ in range(self.pool_size):
+                pool.put_nowait(await self._open_connection(readonly=True))
+            self._pool = pool
 
             self._initialized = True
-            logging.info(f"异步数据库已初始化于 {os.path.abspath(self.db_path)}")
+            self._borrow = self._acquire
+            self.logger.info("异步数据库已初始化于 %s", os.path.abspath(self.db_path))
 
     async def _create_indexes(self, conn):
         """异步创建索引以提高查询性能"""
@@ -177,98 +254,224 @@ class AsyncSQLiteDB(AbstractAsyncDB):
             # user 表索引
             'CREATE INDEX IF NOT EXISTS idx_user_qq_number ON user(qq_number)',
             'CREATE INDEX IF NOT EXISTS idx_user_role ON user(role)',
-            'CREATE INDEX IF NOT EXISTS idx_user_is_active ON user(is_active)',
             'CREATE INDEX IF NOT EXISTS idx_user_created_at ON user(created_at)',
 
             # room 表索引
             'CREATE INDEX IF NOT EXISTS idx_room_creator ON room(creator)',
-            'CREATE INDEX IF NOT EXISTS idx_room_is_active ON room(is_active)',
             'CREATE INDEX IF NOT EXISTS idx_room_created_at ON room(created_at)',
 
             # message 表索引
             'CREATE INDEX IF NOT EXISTS idx_message_sender ON message(sender)',
-            'CREATE INDEX IF NOT EXISTS idx_message_room_uuid ON message(room_uuid)',
             'CREATE INDEX IF NOT EXISTS idx_message_created_at ON message(created_at)',
-            'CREATE INDEX IF NOT EXISTS idx_message_msg_type ON message(msg_type)',
-            'CREATE INDEX IF NOT EXISTS idx_message_is_deleted ON message(is_deleted)',
             'CREATE INDEX IF NOT EXISTS idx_message_reply_to ON message(reply_to)',
-            'CREATE INDEX IF NOT EXISTS idx_message_room_time ON message(room_uuid, created_at DESC)',
-            'CREATE INDEX IF NOT EXISTS idx_message_room_active ON message(room_uuid, is_deleted, created_at DESC)',
+            # 覆盖索引：消息列表查询无需回表；按房间的查询（包括删除房间时的级联删除）使用其前导列
+            'CREATE INDEX IF NOT EXISTS idx_message_room_active ON message(room_uuid, is_deleted, created_at DESC, msg_uuid DESC, sender, msg_type)',
 
             # private_message 表索引
-            'CREATE INDEX IF NOT EXISTS idx_pm_sender ON private_message(sender_uuid)',
-            'CREATE INDEX IF NOT EXISTS idx_pm_receiver ON private_message(receiver_uuid)',
             'CREATE INDEX IF NOT EXISTS idx_pm_created_at ON private_message(created_at)',
-            'CREATE INDEX IF NOT EXISTS idx_pm_is_read ON private_message(is_read)',
-            'CREATE INDEX IF NOT EXISTS idx_pm_conversation ON private_message(sender_uuid, receiver_uuid, created_at DESC)',
-
-            # user_room 表索引
-            'CREATE INDEX IF NOT EXISTS idx_user_room_user ON user_room(user_uuid)',
+            # 按发送方的查询（包括删除用户时的级联删除）使用其前导列；get_private_messages 的每一路
+            # 按 (created_at, msg_uuid) 顺序扫描，is_deleted 直接在索引中过滤
+            'CREATE INDEX IF NOT EXISTS idx_pm_conversation ON private_message(sender_uuid, receiver_uuid, created_at DESC, msg_uuid DESC, msg_type, is_deleted)',
+            # 与 idx_pm_conversation 的 (sender_uuid, receiver_uuid) 前缀对称，私聊用户列表的两路查询都只扫描索引；
+            # 按接收方的查询（包括删除用户时的级联删除）使用其前导列
+            'CREATE INDEX IF NOT EXISTS idx_pm_receiver_sender ON private_message(receiver_uuid, sender_uuid)',
+
+            # user_room 表索引（按 user_uuid 的查询由 UNIQUE(user_uuid, room_uuid) 的前缀覆盖）
             'CREATE INDEX IF NOT EXISTS idx_user_room_room ON user_room(room_uuid)',
             'CREATE INDEX IF NOT EXISTS idx_user_room_joined_at ON user_room(joined_at)',
             'CREATE INDEX IF NOT EXISTS idx_user_room_left_at ON user_room(left_at)',
 
-            # message_read_status 表索引
-            'CREATE INDEX IF NOT EXISTS idx_read_status_user ON message_read_status(user_uuid)',
+            # message_read_status 表索引（按 user_uuid 的查询由 UNIQUE(user_uuid, message_uuid) 的前缀覆盖）
             'CREATE INDEX IF NOT EXISTS idx_read_status_room ON message_read_status(room_uuid)',
             'CREATE INDEX IF NOT EXISTS idx_read_status_message ON message_read_status(message_uuid)',
+
+            # 布尔列和取值很少的列单独建索引时查询规划器几乎不会使用，却要在每次写入时维护；
+            # 未删除消息的查询由 idx_message_room_active / idx_pm_conversation 中的 is_deleted 列过滤
+            'DROP INDEX IF EXISTS idx_user_is_active',
+            'DROP INDEX IF EXISTS idx_room_is_active',
+            'DROP INDEX IF EXISTS idx_message_msg_type',
+            'DROP INDEX IF EXISTS idx_message_is_deleted',
+            'DROP INDEX IF EXISTS idx_pm_is_read',
+
+            # 已被复合索引或唯一约束前缀覆盖的冗余索引
+            'DROP INDEX IF EXISTS idx_message_room_uuid',
+            'DROP INDEX IF EXISTS idx_message_room_time',
+            'DROP INDEX IF EXISTS idx_pm_sender',
+            'DROP INDEX IF EXISTS idx_pm_receiver',
+            'DROP INDEX IF EXISTS idx_user_room_user',
+            'DROP INDEX IF EXISTS idx_read_status_user',
         ]
 
-        for index_sql in indexes:
-            await conn.execute(index_sql)
+        # 一次 executescript 提交全部索引，而不是每个索引一次跨线程调用
+        await conn.executescript(';\n'.join(indexes) + ';')
+
+    async def _configure_connection(self, conn: aiosqlite.Connection):
+        """为新连接应用连接级 PRAGMA，每个连接只执行一次"""
+        await conn.execute('PRAGMA foreign_keys = ON')
+        await conn.execute('PRAGMA synchronous = NORMAL')
+        await conn.execute('PRAGMA cache_size = -64000')
+        await conn.execute('PRAGMA mmap_size = 268435456')
+        await conn.execute('PRAGMA temp_store = MEMORY')
+        await conn.execute('PRAGMA busy_timeout = 5000')
+        # WAL 文件在检查点后截断到 64MB 以内；每 1000 页自动检查点一次（显式写出默认值）
+        await conn.execute('PRAGMA journal_size_limit = 67108864')
+        await conn.execute('PRAGMA wal_autocheckpoint = 1000')
+
+    async def _open_connection(self, readonly: bool = False) -> aiosqlite.Connection:
+        """创建一个已配置好的连接，readonly 时以只读模式打开数据库文件"""
+        if readonly:
+            database, uri = Path(self.db_path).resolve().as_uri() + '?mode=ro', True
+        else:
+            database, uri = self.db_path, False
+        # isolation_level=None：sqlite3 不再隐式开启事务，单条写语句自动提交，无需再发一次 commit；
+        # 多条语句需要原子执行时显式 BEGIN ... COMMIT
+        conn = await aiosqlite.connect(database, timeout=30.0, detect_types=sqlite3.PARSE_DECLTYPES, uri=uri,
+                                       isolation_level=None)
+        conn.row_factory = aiosqlite.Row
+        await self._configure_connection(conn)
+        if readonly:
+            # 除只读打开文件外，在连接层面也拒绝任何修改（包括临时表），误用读连接执行写语句时立即报错
+            await conn.execute('PRAGMA query_only = 1')
+        return conn
 
     @asynccontextmanager
-    async def get_connection(self) -> AsyncContextManager[aiosqlite.Connection]:
+    async def _borrow(self, pool_name: str) -> AsyncContextManager[aiosqlite.Connection]:
         """
-        获取数据库连接的异步上下文管理器。
-        每次调用都会创建一个新的连接，确保线程安全和异步操作的正确性。
+        初始化数据库后从指定连接池借出一个连接。
+        只在初始化完成前使用：init_database 完成后会以实例属性
+        self._borrow = self._acquire 覆盖本方法，之后的调用不再检查初始化状态。
         """
-        if not self._initialized:
-            await self.init_database()
+        await self.init_database()
+        async with self._acquire(pool_name) as conn:
+            yield conn
 
-        conn = None
+    @asynccontextmanager
+    async def _acquire(self, pool_name: str) -> AsyncContextManager[aiosqlite.Connection]:
+        """从指定连接池借出一个连接，退出时归还；池耗尽时等待其他协程归还"""
+        pool: asyncio.Queue = getattr(self, pool_name)
+        conn = await pool.get()
         try:
-            conn = await aiosqlite.connect(
-                self.db_path,
-                timeout=30.0
-            )
-            # 配置连接
-            conn.row_factory = aiosqlite.Row
-            await conn.execute('PRAGMA foreign_keys = ON')
-
             yield conn
-
         except Exception as e:
-            if conn:
-                await conn.rollback()
-            print(f"异步数据库操作失败: {e}")
+            self.logger.error("异步数据库操作失败: %s", e)
             raise
         finally:
-            if conn:
+            clean = False
+            try:
+                # 归还前确保没有遗留的未提交事务
+                if conn.in_transaction:
+                    await conn.rollback()
+                clean = True
+            finally:
+                if clean:
+                    pool.put_nowait(conn)
+                else:
+                    # 回滚失败或等待回滚时被取消：连接状态不可信，在后台换一个新连接放回池中。
+                    # 写连接池容量为 1，连接不归还会让之后的所有写操作永远等待
+                    task = asyncio.create_task(self._replace_connection(pool, conn, pool_name == '_pool'))
+                    self._replacing.add(task)
+                    task.add_done_callback(self._replacing.discard)
+
+    async def _replace_connection(self, pool: asyncio.Queue, conn: aiosqlite.Connection, readonly: bool):
+        """打开新连接替换 conn 放回池中；新连接打不开时仍归还原连接，让后续调用报错而不是挂起"""
+        try:
+            new_conn = await self._open_connection(readonly=readonly)
+        except Exception as e:
+            self.logger.error("替换数据库连接失败，归还原连接: %s", e)
+            pool.put_nowait(conn)
+            return
+        pool.put_nowait(new_conn)
+        try:
+            await conn.close()
+        except Exception as e:
+            self.logger.warning("关闭异常连接失败: %s", e)
+
+    def get_reader(self) -> AsyncContextManager[aiosqlite.Connection]:
+        """
+        借出一个只读连接。WAL 模式下读连接读取已提交的快照，不会被写连接阻塞。
+        """
+        return self._borrow('_pool')
+
+    def get_writer(self) -> AsyncContextManager[aiosqlite.Connection]:
+        """
+        借出唯一的写连接，持有期间其他写操作排队等待。
+        """
+        return self._borrow('_writer')
+
+    def get_connection(self) -> AsyncContextManager[aiosqlite.Connection]:
+        """
+        获取数据库连接的异步上下文管理器。
+        返回写连接，可执行任意语句；只读查询应使用 get_reader。
+        同一时间一个连接只会被一个协程持有。
+        """
+        return self.get_writer()
+
+    async def close(self):
+        """
+        关闭写连接和只读连接池中的所有连接
+        """
+        for pool in (self._pool, self._writer):
+            if pool is None:
+                continue
+            while not pool.empty():
+                conn = pool.get_nowait()
                 await conn.close()
+        self._pool = None
+        self._writer = None
+        # 关闭后再次使用时重新初始化
+        self.__dict__.pop('_borrow', None)
+        self._initialized = False
+        self.logger.info("SQLite连接池已关闭")
 
     async def execute_transaction(self, operations: List[tuple]) -> bool:
         """
         在单个事务中异步执行多个SQL操作。
 
         Args:
-            operations (List[tuple]): 一个操作列表，每个元素是一个 (sql, params) 的元组。
+            operations (List[tuple]): 一个操作列表，每个元素是一个 (sql, params) 的元组。参数中的 UUID 需先用 _pack 转为字节。
 
         Returns:
             bool: 成功返回 True，失败返回 False。
         """
-        async with self.get_connection() as conn:
+        async with self.get_writer() as conn:
             try:
-                await conn.execute('BEGIN TRANSACTION')
+                # IMMEDIATE 在事务开始时即获取写锁，避免中途升级锁时遇到 SQLITE_BUSY
+                await conn.execute('BEGIN IMMEDIATE')
                 for sql, params in operations:
                     await conn.execute(sql, params or ())
                 await conn.commit()
                 return True
             except Exception as e:
                 await conn.rollback()
-                print(f"异步事务失败: {e}")
+                self.logger.error("异步事务失败: %s", e)
                 return False
 
+    async def execute_many(self, sql: str, params_seq: List[tuple]) -> int:
+        """
+        在单个事务中用同一条SQL批量执行多组参数。
+
+        Args:
+            sql (str): 要执行的SQL语句。
+            params_seq (List[tuple]): 参数元组列表。参数中的 UUID 需先用 _pack 转为字节。
+
+        Returns:
+            int: 受影响的行数，失败返回 -1。
+        """
+        if not params_seq:
+            return 0
+
+        async with self.get_writer() as conn:
+            try:
+                # IMMEDIATE 在事务开始时即获取写锁，避免中途升级锁失败
+                await conn.execute('BEGIN IMMEDIATE')
+                cursor = await conn.executemany(sql, params_seq)
+                await conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                await conn.rollback()
+                self.logger.error("异步批量执行失败: %s", e)
+                return -1
+
     async def get_database_info(self) -> dict:
         """
         异步获取数据库的元信息，如大小和表中的行数。
@@ -276,7 +479,7 @@ class AsyncSQLiteDB(AbstractAsyncDB):
         Returns:
             dict: 包含数据库信息的字典。
         """
-        async with self.get_connection() as conn:
+        async with self.get_reader() as conn:
             # 获取数据库大小
             async with conn.execute(
                     "SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()") as cursor:
@@ -286,20 +489,27 @@ class AsyncSQLiteDB(AbstractAsyncDB):
             # 获取所有表名
             async with conn.execute(
                     "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'") as cursor:
-                tables = [row[0] async for row in cursor]
+                tables = [row[0] for row in await cursor.fetchall()]
 
-            # 获取每个表的记录数
+            # 获取每个表的记录数：合并为一条 UNION ALL 查询，在同一个读快照中一次取回
             table_info = {}
-            for table in tables:
-                async with conn.execute(f"SELECT COUNT(*) FROM {table}") as cursor:
-                    result = await cursor.fetchone()
-                    table_info[table] = result[0] if result else 0
+            if tables:
+                sql = ' UNION ALL '.join(f"SELECT ?, COUNT(*) FROM {table}" for table in tables)
+                async with conn.execute(sql, tables) as cursor:
+                    table_info = {name: count for name, count in await cursor.fetchall()}
 
             return {
                 'database_size_bytes': db_size,
                 'tables': table_info
             }
 
+    @staticmethod
+    def _seek_clause(alias: str, before: Optional[Tuple[int, str]]) -> Tuple[str, tuple]:
+        """构造键集分页条件：只取排在 before=(created_at, msg_uuid) 之后的行"""
+        if before is None:
+            return '', ()
+        return f'AND ({alias}.created_at, {alias}.msg_uuid) < (?, ?)', (before[0], _pack(before[1]))
+
     # --- 业务逻辑方法 ---
 
     async def create_user(self, user_data: Dict[str, Any]) -> str:
@@ -312,31 +522,26 @@ class AsyncSQLiteDB(AbstractAsyncDB):
         Returns:
             str: 创建的用户UUID，失败则返回空字符串。
         """
-        user_uuid = str(uuid.uuid4())
-        current_timestamp = int(datetime.now(UTC).timestamp())
+        user_uuid = _next_uuid()
+        current_timestamp = int(time.time())
 
         try:
-            async with self.get_connection() as conn:
-                await conn.execute('''
-                    INSERT INTO user (user_uuid, qq_number, name, avatar_path, role,
-                                    password_hash, inviter, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    user_uuid,
+            async with self.get_writer() as conn:
+                await conn.execute(_SQL_INSERT_USER, (
+                    user_uuid.bytes,
                     user_data.get('qq_number'),
                     user_data.get('name'),
                     user_data.get('avatar_path'),
                     user_data.get('role', 'user'),
                     user_data.get('password_hash'),
-                    user_data.get('inviter'),
+                    _pack(user_data.get('inviter')),
                     current_timestamp,
                     current_timestamp
                 ))
-                await conn.commit()
-                logging.info(f"用户创建成功: {user_uuid}")
-                return user_uuid
+                self.logger.info("用户创建成功: %s", user_uuid)
+                return str(user_uuid)
         except Exception as e:
-            print(f"创建用户失败: {e}")
+            self.logger.error("创建用户失败: %s", e)
             return ""
 
     async def get_user_by_uuid(self, user_uuid: str) -> Optional[Dict[str, Any]]:
@@ -350,15 +555,15 @@ class AsyncSQLiteDB(AbstractAsyncDB):
             Optional[Dict[str, Any]]: 用户信息字典，不存在则返回None。
         """
         try:
-            async with self.get_connection() as conn:
+            async with self.get_reader() as conn:
                 async with conn.execute(
                         'SELECT * FROM user WHERE user_uuid = ? AND is_active = 1',
-                        (user_uuid,)
+                        (_pack(user_uuid),)
                 ) as cursor:
                     row = await cursor.fetchone()
                     return dict(row) if row else None
         except Exception as e:
-            print(f"获取用户失败: {e}")
+            self.logger.error("获取用户失败: %s", e)
             return None
 
     async def get_user_by_qq_number(self, qq_number: str) -> Optional[Dict[str, Any]]:
@@ -370,7 +575,7 @@ class AsyncSQLiteDB(AbstractAsyncDB):
             Optional[Dict[str, Any]]: 用户信息字典，如果用户不存在或不活跃则返回None。
         """
         try:
-            async with self.get_connection() as conn:
+            async with self.get_reader() as conn:
                 async with conn.execute(
                         'SELECT * FROM user WHERE qq_number = ? AND is_active = 1',
                         (qq_number,)
@@ -378,7 +583,52 @@ class AsyncSQLiteDB(AbstractAsyncDB):
                     row = await cursor.fetchone()
                     return dict(row) if row else None
         except Exception as e:
-            print(f"获取用户（通过QQ号）失败: {e}")
+            self.logger.error("获取用户（通过QQ号）失败: %s", e)
+            return None
+
+    async def get_user_public(self, user_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        异步获取用户的公开信息，不读取密码哈希等字段。
+
+        Args:
+            user_uuid (str): 用户UUID。
+
+        Returns:
+            Optional[Dict[str, Any]]: 用户公开信息字典，不存在则返回None。
+        """
+        try:
+            async with self.get_reader() as conn:
+                async with conn.execute(
+                        'SELECT user_uuid, qq_number, name, avatar_path, role, is_active '
+                        'FROM user WHERE user_uuid = ? AND is_active = 1',
+                        (_pack(user_uuid),)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                    return dict(row) if row else None
+        except Exception as e:
+            self.logger.error("获取用户公开信息失败: %s", e)
+            return None
+
+    async def get_user_auth(self, user_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        异步获取用户的认证信息。
+
+        Args:
+            user_uuid (str): 用户UUID。
+
+        Returns:
+            Optional[Dict[str, Any]]: 包含 user_uuid, role, password_hash 的字典，不存在则返回None。
+        """
+        try:
+            async with self.get_reader() as conn:
+                async with conn.execute(
+                        'SELECT user_uuid, role, password_hash FROM user WHERE user_uuid = ? AND is_active = 1',
+                        (_pack(user_uuid),)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                    return dict(row) if row else None
+        except Exception as e:
+            self.logger.error("获取用户认证信息失败: %s", e)
             return None
 
     async def update_user(self, user_uuid: str, update_data: Dict[str, Any]) -> bool:
@@ -395,25 +645,29 @@ class AsyncSQLiteDB(AbstractAsyncDB):
         if not update_data:
             return False
 
-        # 添加updated_at时间戳
-        update_data['updated_at'] = int(datetime.now(UTC).timestamp())
+        if update_data.keys() == {'last_login_at'}:
+            # 登录时只更新 last_login_at，是最常见的形状，直接使用固定语句
+            sql = _SQL_UPDATE_LAST_LOGIN
+            values = (update_data['last_login_at'], int(time.time()), _pack(user_uuid))
+        else:
+            if 'inviter' in update_data:
+                update_data['inviter'] = _pack(update_data['inviter'])
 
-        # 构建动态SQL
-        fields = list(update_data.keys())
-        values = list(update_data.values())
-        values.append(user_uuid)  # WHERE条件的值
+            # 添加updated_at时间戳
+            update_data['updated_at'] = int(time.time())
 
-        set_clause = ', '.join([f"{field} = ?" for field in fields])
-        sql = f"UPDATE user SET {set_clause} WHERE user_uuid = ?"
+            # 构建动态SQL，相同的列组合复用同一条语句
+            sql = _build_update_sql(tuple(update_data))
+            values = list(update_data.values())
+            values.append(_pack(user_uuid))  # WHERE条件的值
 
         try:
-            async with self.get_connection() as conn:
+            async with self.get_writer() as conn:
                 await conn.execute(sql, values)
-                await conn.commit()
-                logging.info(f"用户更新成功: {user_uuid}")
+                self.logger.info("用户更新成功: %s", user_uuid)
                 return True
         except Exception as e:
-            print(f"更新用户失败: {e}")
+            self.logger.error("更新用户失败: %s", e)
             return False
 
     async def create_room(self, room_data: Dict[str, Any]) -> str:
@@ -426,40 +680,35 @@ class AsyncSQLiteDB(AbstractAsyncDB):
         Returns:
             str: 创建的房间UUID，失败则返回空字符串。
         """
-        room_uuid = str(uuid.uuid4())
-        current_timestamp = int(datetime.now(UTC).timestamp())
+        room_uuid = _next_uuid()
+        creator = _pack(room_data.get('creator'))
+        current_timestamp = int(time.time())
 
         try:
-            async with self.get_connection() as conn:
+            async with self.get_writer() as conn:
+                # 两条 INSERT 需要在同一事务中完成
+                await conn.execute('BEGIN IMMEDIATE')
                 # 创建房间
-                await conn.execute('''
-                    INSERT INTO room (room_uuid, name, description, avatar_path, 
-                                    max_online_users, max_join_users, creator, 
-                                    created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    room_uuid,
+                await conn.execute(_SQL_INSERT_ROOM, (
+                    room_uuid.bytes,
                     room_data.get('name'),
                     room_data.get('description'),
                     room_data.get('avatar_path'),
                     room_data.get('max_online_users', 100),
                     room_data.get('max_join_users', 500),
-                    room_data.get('creator'),
+                    creator,
                     current_timestamp,
                     current_timestamp
                 ))
 
                 # 将创建者添加为房间所有者
-                await conn.execute('''
-                    INSERT INTO user_room (user_uuid, room_uuid, role, joined_at)
-                    VALUES (?, ?, 'owner', ?)
-                ''', (room_data.get('creator'), room_uuid, current_timestamp))
+                await conn.execute(_SQL_INSERT_ROOM_OWNER, (creator, room_uuid.bytes, current_timestamp))
 
                 await conn.commit()
-                logging.info(f"房间创建成功: {room_uuid}")
-                return room_uuid
+                self.logger.info("房间创建成功: %s", room_uuid)
+                return str(room_uuid)
         except Exception as e:
-            print(f"创建房间失败: {e}")
+            self.logger.error("创建房间失败: %s", e)
             return ""
 
     async def send_message(self, message_data: Dict[str, Any]) -> str:
@@ -472,91 +721,176 @@ class AsyncSQLiteDB(AbstractAsyncDB):
         Returns:
             str: 创建的消息UUID，失败则返回空字符串。
         """
-        msg_uuid = str(uuid.uuid4())
-        current_timestamp = int(datetime.now(UTC).timestamp())
+        msg_uuid = _next_uuid()
+        current_timestamp = int(time.time())
 
         try:
-            async with self.get_connection() as conn:
-                await conn.execute('''
-                    INSERT INTO message (msg_uuid, sender, msg_type, content, room_uuid, 
-                                       reply_to, file_path, file_size, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    msg_uuid,
-                    message_data.get('sender'),
+            async with self.get_writer() as conn:
+                await conn.execute(_SQL_INSERT_MESSAGE, (
+                    msg_uuid.bytes,
+                    _pack(message_data.get('sender')),
                     message_data.get('msg_type', 'text'),
                     message_data.get('content'),
-                    message_data.get('room_uuid'),
-                    message_data.get('reply_to'),
+                    _pack(message_data.get('room_uuid')),
+                    _pack(message_data.get('reply_to')),
                     message_data.get('file_path'),
                     message_data.get('file_size'),
                     current_timestamp
                 ))
-                await conn.commit()
-                logging.info(f"消息发送成功: {msg_uuid}")
-                return msg_uuid
+                self.logger.info("消息发送成功: %s", msg_uuid)
+                return str(msg_uuid)
         except Exception as e:
-            print(f"发送消息失败: {e}")
+            self.logger.error("发送消息失败: %s", e)
             return ""
 
-    async def get_room_messages(self, room_uuid: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+    async def send_messages_bulk(self, messages: List[Dict[str, Any]]) -> List[str]:
+        """
+        在单个事务中批量写入房间消息，一次 executemany 完成全部插入。
+
+        Args:
+            messages (List[Dict[str, Any]]): 消息数据字典列表。
+
+        Returns:
+            List[str]: 与输入顺序一致的消息UUID列表，失败则返回空列表。
+        """
+        if not messages:
+            return []
+
+        msg_uuids = [_next_uuid() for _ in messages]
+        current_timestamp = int(time.time())
+        rows = [(
+            msg_uuid.bytes,
+            _pack(message_data.get('sender')),
+            message_data.get('msg_type', 'text'),
+            message_data.get('content'),
+            _pack(message_data.get('room_uuid')),
+            _pack(message_data.get('reply_to')),
+            message_data.get('file_path'),
+            message_data.get('file_size'),
+            current_timestamp
+        ) for msg_uuid, message_data in zip(msg_uuids, messages)]
+
+        try:
+            async with self.get_writer() as conn:
+                # 全部行在同一事务中写入，只在 commit 时追加一次 WAL 帧
+                await conn.execute('BEGIN IMMEDIATE')
+                await conn.executemany(_SQL_INSERT_MESSAGE, rows)
+                await conn.commit()
+                self.logger.info("批量发送消息成功: %s 条", len(msg_uuids))
+                return [str(msg_uuid) for msg_uuid in msg_uuids]
+        except Exception as e:
+            self.logger.error("批量发送消息失败: %s", e)
+            return []
+
+    async def get_room_messages(self, room_uuid: str, limit: int = 50,
+                                before: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
         """
-        异步获取房间消息（分页）。
+        异步获取房间消息（键集分页）。
 
         Args:
             room_uuid (str): 房间UUID。
             limit (int): 每页消息数量。
-            offset (int): 偏移量。
+            before (Optional[Tuple[int, str]]): 上一页最后一条消息的 (created_at, msg_uuid)。
 
         Returns:
             List[Dict[str, Any]]: 消息列表。
         """
+        seek_clause, seek_params = self._seek_clause('m', before)
         try:
-            async with self.get_connection() as conn:
-                async with conn.execute('''
+            async with self.get_reader() as conn:
+                async with conn.execute(f'''
                     SELECT m.*, u.name as sender_name, u.avatar_path as sender_avatar
                     FROM message m
                     LEFT JOIN user u ON m.sender = u.user_uuid
-                    WHERE m.room_uuid = ? AND m.is_deleted = 0
-                    ORDER BY m.created_at DESC
-                    LIMIT ? OFFSET ?
-                ''', (room_uuid, limit, offset)) as cursor:
-                    return [dict(row) async for row in cursor]
+                    WHERE m.room_uuid = ? AND m.is_deleted = 0 {seek_clause}
+                    ORDER BY m.created_at DESC, m.msg_uuid DESC
+                    LIMIT ?
+                ''', (_pack(room_uuid), *seek_params, limit)) as cursor:
+                    cursor.row_factory = _dict_row
+                    return await cursor.fetchall()
+        except Exception as e:
+            self.logger.error("获取房间消息失败: %s", e)
+            return []
+
+    async def get_room_message_summaries(self, room_uuid: str, limit: int = 50,
+                                         before: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
+        """
+        异步获取房间消息摘要（键集分页），查询只涉及 idx_message_room_active 中的列。
+
+        Args:
+            room_uuid (str): 房间UUID。
+            limit (int): 每页消息数量。
+            before (Optional[Tuple[int, str]]): 上一页最后一条消息的 (created_at, msg_uuid)。
+
+        Returns:
+            List[Dict[str, Any]]: 消息摘要列表。
+        """
+        seek_clause, seek_params = self._seek_clause('message', before)
+        try:
+            async with self.get_reader() as conn:
+                async with conn.execute(f'''
+                    SELECT msg_uuid, sender, msg_type, created_at
+                    FROM message
+                    WHERE room_uuid = ? AND is_deleted = 0 {seek_clause}
+                    ORDER BY created_at DESC, msg_uuid DESC
+                    LIMIT ?
+                ''', (_pack(room_uuid), *seek_params, limit)) as cursor:
+                    cursor.row_factory = _dict_row
+                    return await cursor.fetchall()
         except Exception as e:
-            print(f"获取房间消息失败: {e}")
+            self.logger.error("获取房间消息摘要失败: %s", e)
             return []
 
+    async def get_message(self, msg_uuid: str) -> Optional[Dict[str, Any]]:
+        """
+        异步根据UUID获取单条房间消息。
+
+        Args:
+            msg_uuid (str): 消息UUID。
+
+        Returns:
+            Optional[Dict[str, Any]]: 消息字典，不存在则返回None。
+        """
+        try:
+            async with self.get_reader() as conn:
+                async with conn.execute('''
+                    SELECT m.*, u.name as sender_name, u.avatar_path as sender_avatar
+                    FROM message m
+                    LEFT JOIN user u ON m.sender = u.user_uuid
+                    WHERE m.msg_uuid = ? AND m.is_deleted = 0
+                ''', (_pack(msg_uuid),)) as cursor:
+                    row = await cursor.fetchone()
+                    return dict(row) if row else None
+        except Exception as e:
+            self.logger.error("获取消息失败: %s", e)
+            return None
+
     async def send_private_message(self, message_data: Dict[str, Any]) -> str:
         """
         异步发送私聊消息
         :param message_data: 私聊消息数据字典，包含 sender_uuid, receiver_uuid, content 等字段
         :return: 创建的消息UUID，失败则返回空字符串
         """
-        msg_uuid = str(uuid.uuid4())
-        current_timestamp = int(datetime.now(UTC).timestamp())
+        msg_uuid = _next_uuid()
+        current_timestamp = int(time.time())
 
         try:
-            async with self.get_connection() as conn:
-                await conn.execute('''
-                    INSERT INTO private_message (msg_uuid, sender_uuid, receiver_uuid, msg_type, content, 
-                                               reply_to, file_path, file_size, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    msg_uuid,
-                    message_data.get('sender_uuid'),
-                    message_data.get('receiver_uuid'),
+            async with self.get_writer() as conn:
+                await conn.execute(_SQL_INSERT_PM, (
+                    msg_uuid.bytes,
+                    _pack(message_data.get('sender_uuid')),
+                    _pack(message_data.get('receiver_uuid')),
                     message_data.get('msg_type', 'text'),
                     message_data.get('content'),
-                    message_data.get('reply_to'),
+                    _pack(message_data.get('reply_to')),
                     message_data.get('file_path'),
                     message_data.get('file_size'),
                     current_timestamp
                 ))
-                await conn.commit()
-                logging.info(f"私聊消息发送成功: {msg_uuid}")
-                return msg_uuid
+                self.logger.info("私聊消息发送成功: %s", msg_uuid)
+                return str(msg_uuid)
         except Exception as e:
-            print(f"发送私聊消息失败: {e}")
+            self.logger.error("发送私聊消息失败: %s", e)
             return ""
 
     async def get_private_message_users(self, user_uuid: str) -> List[str]:
@@ -566,50 +900,70 @@ class AsyncSQLiteDB(AbstractAsyncDB):
         :return: 对应的用户UUID列表
         """
         try:
-            async with self.get_connection() as conn:
+            async with self.get_reader() as conn:
+                # 每一路按索引顺序去重，两路之间用 UNION ALL 避免 SQLite 构建临时 B 树，
+                # 同时作为发送方和接收方出现的用户在 Python 中去重
                 async with conn.execute('''
                     SELECT DISTINCT receiver_uuid AS user_uuid 
                     FROM private_message 
                     WHERE sender_uuid = ?
-                    UNION
+                    UNION ALL
                     SELECT DISTINCT sender_uuid AS user_uuid 
                     FROM private_message 
                     WHERE receiver_uuid = ?
-                ''', (user_uuid, user_uuid)) as cursor:
+                ''', (_pack(user_uuid), _pack(user_uuid))) as cursor:
                     rows = await cursor.fetchall()
-                    return [row['user_uuid'] for row in rows]
+                    return list(dict.fromkeys(row['user_uuid'] for row in rows))
         except Exception as e:
-            print(f"获取私聊用户列表失败: {e}")
+            self.logger.error("获取私聊用户列表失败: %s", e)
             return []
 
-    async def get_private_messages(self, user_uuid1: str, user_uuid2: str, limit: int = 50, offset: int = 0) -> List[
-        Dict[str, Any]]:
+    async def get_private_messages(self, user_uuid1: str, user_uuid2: str, limit: int = 50,
+                                   before: Optional[Tuple[int, str]] = None) -> List[Dict[str, Any]]:
         """
-        异步获取私聊消息（分页）
+        异步获取私聊消息（键集分页）
         :param user_uuid1: 用户1 UUID
         :param user_uuid2: 用户2 UUID
         :param limit: 每页消息数量，默认50
-        :param offset: 偏移量，默认0
+        :param before: 上一页最后一条消息的 (created_at, msg_uuid)，为 None 时返回最新一页
         :return: 私聊消息列表，每个消息包含详细信息
         """
+        seek_clause, seek_params = self._seek_clause('pm', before)
+        uuid1, uuid2 = _pack(user_uuid1), _pack(user_uuid2)
         try:
-            async with self.get_connection() as conn:
-                async with conn.execute('''
-                    SELECT pm.*, 
+            async with self.get_reader() as conn:
+                # 两个方向各自在 idx_pm_conversation 上按序取前 limit 条，外层只需合并不超过 2 * limit 行；
+                # 写成 OR 时 SQLite 会对游标之后的整段会话建临时 B 树排序。
+                # 自己与自己的会话只走第一路，避免结果重复
+                async with conn.execute(f'''
+                    SELECT pm.*,
                            s.name AS sender_name, s.avatar_path AS sender_avatar,
                            r.name AS receiver_name, r.avatar_path AS receiver_avatar
-                    FROM private_message pm
+                    FROM (
+                        SELECT * FROM (
+                            SELECT * FROM private_message pm
+                            WHERE pm.sender_uuid = ? AND pm.receiver_uuid = ? AND pm.is_deleted = 0 {seek_clause}
+                            ORDER BY pm.created_at DESC, pm.msg_uuid DESC
+                            LIMIT ?
+                        )
+                        UNION ALL
+                        SELECT * FROM (
+                            SELECT * FROM private_message pm
+                            WHERE pm.sender_uuid = ? AND pm.receiver_uuid = ? AND pm.is_deleted = 0 {seek_clause}
+                              AND pm.sender_uuid != pm.receiver_uuid
+                            ORDER BY pm.created_at DESC, pm.msg_uuid DESC
+                            LIMIT ?
+                        )
+                    ) pm
                     LEFT JOIN user s ON pm.sender_uuid = s.user_uuid
                     LEFT JOIN user r ON pm.receiver_uuid = r.user_uuid
-                    WHERE (pm.sender_uuid = ? AND pm.receiver_uuid = ?) 
-                       OR (pm.sender_uuid = ? AND pm.receiver_uuid = ?)
-                    AND pm.is_deleted = 0
-                    ORDER BY pm.created_at DESC
-                    LIMIT ? OFFSET ?
-                ''', (user_uuid1, user_uuid2, user_uuid2, user_uuid1, limit, offset)) as cursor:
-                    return [dict(row) async for row in cursor]
+                    ORDER BY pm.created_at DESC, pm.msg_uuid DESC
+                    LIMIT ?
+                ''', (uuid1, uuid2, *seek_params, limit, uuid2, uuid1, *seek_params, limit, limit)) as cursor:
+                    cursor.row_factory = _dict_row
+                    return await cursor.fetchall()
         except Exception as e:
-            print(f"获取私聊消息失败: {e}")
+            self.logger.error("获取私聊消息失败: %s", e)
             return []
 
     async def join_room(self, user_uuid: str, room_uuid: str) -> bool:
@@ -623,19 +977,15 @@ class AsyncSQLiteDB(AbstractAsyncDB):
         Returns:
             bool: 加入成功返回True，失败返回False。
         """
-        current_timestamp = int(datetime.now(UTC).timestamp())
+        current_timestamp = int(time.time())
 
         try:
-            async with self.get_connection() as conn:
-                await conn.execute('''
-                    INSERT OR REPLACE INTO user_room (user_uuid, room_uuid, role, joined_at, left_at)
-                    VALUES (?, ?, 'member', ?, NULL)
-                ''', (user_uuid, room_uuid, current_timestamp))
-                await conn.commit()
-                logging.info(f"用户 {user_uuid} 成功加入房间 {room_uuid}")
+            async with self.get_writer() as conn:
+                await conn.execute(_SQL_JOIN_ROOM, (_pack(user_uuid), _pack(room_uuid), current_timestamp))
+                self.logger.info("用户 %s 成功加入房间 %s", user_uuid, room_uuid)
                 return True
         except Exception as e:
-            print(f"用户加入房间失败: {e}")
+            self.logger.error("用户加入房间失败: %s", e)
             return False
 
     async def leave_room(self, user_uuid: str, room_uuid: str) -> bool:
@@ -649,18 +999,13 @@ class AsyncSQLiteDB(AbstractAsyncDB):
         Returns:
             bool: 退出成功返回True，失败返回False。
         """
-        current_timestamp = int(datetime.now(UTC).timestamp())
+        current_timestamp = int(time.time())
 
         try:
-            async with self.get_connection() as conn:
-                await conn.execute('''
-                    UPDATE user_room 
-                    SET left_at = ? 
-                    WHERE user_uuid = ? AND room_uuid = ? AND left_at IS NULL
-                ''', (current_timestamp, user_uuid, room_uuid))
-                await conn.commit()
-                logging.info(f"用户 {user_uuid} 成功退出房间 {room_uuid}")
+            async with self.get_writer() as conn:
+                await conn.execute(_SQL_LEAVE_ROOM, (current_timestamp, _pack(user_uuid), _pack(room_uuid)))
+                self.logger.info("用户 %s 成功退出房间 %s", user_uuid, room_uuid)
                 return True
         except Exception as e:
-            print(f"用户退出房间失败: {e}")
+            self.logger.error("用户退出房间失败: %s", e)
             return False
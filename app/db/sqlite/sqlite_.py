@@ -3,11 +3,14 @@
 import sqlite3
 import uuid
 import os
+import itertools
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from contextlib import contextmanager
 import threading
+import queue
 import logging
+from pathlib import Path
 
 # --- 最佳实践建议 ---
 # 更新 'updated_at' 时间戳的责任已从数据库触发器移至应用程序层。
@@ -18,26 +21,86 @@ import logging
 #   current_timestamp = int(datetime.utcnow().timestamp())
 #   db.execute("UPDATE user SET name = ?, updated_at = ? WHERE user_uuid = ?",
 #              ('new_name', current_timestamp, 'some_uuid'))
+#
+# 连接以自动提交模式打开（isolation_level=None）。需要原子执行多条语句时使用 execute_transaction，
+# 或在 get_connection 中显式执行 BEGIN IMMEDIATE ... COMMIT。
 # ------------------------------------
 
+# 关系表以自然键作为主键并使用 WITHOUT ROWID，行数据直接存放在主键 B 树中，
+# 不再另外维护 rowid 表和 UNIQUE 索引两份数据。{table} 用于迁移时先以临时表名创建
+_USER_ROOM_DDL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        user_uuid TEXT NOT NULL,
+        room_uuid TEXT NOT NULL,
+        role TEXT DEFAULT 'member' CHECK (role IN ('owner', 'admin', 'member')),
+        is_muted INTEGER DEFAULT 0,
+        joined_at INTEGER DEFAULT (strftime('%s', 'now')),
+        left_at INTEGER,
+        PRIMARY KEY (user_uuid, room_uuid),
+        FOREIGN KEY (user_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
+        FOREIGN KEY (room_uuid) REFERENCES room(room_uuid) ON DELETE CASCADE
+    ) WITHOUT ROWID
+'''
+_USER_ROOM_COLUMNS = 'user_uuid, room_uuid, role, is_muted, joined_at, left_at'
+
+_MESSAGE_READ_STATUS_DDL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        user_uuid TEXT NOT NULL,
+        message_uuid TEXT NOT NULL,
+        room_uuid TEXT NOT NULL,
+        read_at INTEGER DEFAULT (strftime('%s', 'now')),
+        PRIMARY KEY (user_uuid, message_uuid),
+        FOREIGN KEY (user_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
+        FOREIGN KEY (message_uuid) REFERENCES message(msg_uuid) ON DELETE CASCADE,
+        FOREIGN KEY (room_uuid) REFERENCES room(room_uuid) ON DELETE CASCADE
+    ) WITHOUT ROWID
+'''
+_MESSAGE_READ_STATUS_COLUMNS = 'user_uuid, message_uuid, room_uuid, read_at'
+
+
 class SQLiteDB:
     """
     一个用于管理SQLite数据库的类，经过优化和修复。
-    支持多线程环境，使用线程本地存储来管理连接。
+    支持多线程环境：一个写连接加一组只读连接组成的连接池，连接用完归还而不是关闭。
     """
-    def __init__(self, db_path: str = "chat.db"):
+    def __init__(self, db_path: str = "chat.db", read_pool_size: Optional[int] = None,
+                 pool_timeout: float = 5.0, optimize_interval: float = 4 * 3600,
+                 checkpoint_interval: float = 60, wal_size_limit: int = 64 * 1024 * 1024):
         """
         初始化SQLite数据库连接。
 
         Args:
             db_path (str): 数据库文件路径。
+            read_pool_size (Optional[int]): 只读连接数上限，默认 min(32, CPU 核数 * 4)。
+            pool_timeout (float): 连接池耗尽时等待归还的秒数，超时抛出 queue.Empty。
+            optimize_interval (float): 后台执行 PRAGMA optimize 的间隔秒数，为 0 时不启动定时任务。
+            checkpoint_interval (float): 后台检查 WAL 文件大小的间隔秒数，为 0 时不启动定时任务。
+            wal_size_limit (int): WAL 文件超过该字节数时执行 wal_checkpoint(TRUNCATE)。
         """
         self.db_path = db_path
-        # 使用线程本地存储，确保每个线程拥有一个独立的连接
-        self._local = threading.local()
+        self.read_pool_size = read_pool_size or min(32, (os.cpu_count() or 1) * 4)
+        self.pool_timeout = pool_timeout
+        # SQLite 同一时间只允许一个写者，写连接放在容量为 1 的队列中
+        self._write_pool: queue.Queue = queue.Queue(maxsize=1)
+        # 只读连接按需创建，最多 read_pool_size 个
+        self._read_pool: queue.Queue = queue.Queue(maxsize=self.read_pool_size)
+        self._read_opened = 0
+        self._read_lock = threading.Lock()
+        self._write_pool.put(self._open_connection())
         self.init_database()
         logging.info(f"数据库已初始化于 {os.path.abspath(self.db_path)}")
 
+        # 后台维护任务，各自使用一个守护线程定时器，执行完毕后再安排下一次
+        self.optimize_interval = optimize_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.wal_size_limit = wal_size_limit
+        self._timers: Dict[str, threading.Timer] = {}
+        self._closed = False
+        if self.optimize_interval:
+            self._schedule('optimize', self.optimize_interval, self.optimize)
+        if self.checkpoint_interval:
+            self._schedule('checkpoint', self.checkpoint_interval, self.checkpoint_if_needed)
+
     def init_database(self):
         """
         初始化数据库，创建表结构和索引。
@@ -46,14 +109,9 @@ class SQLiteDB:
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            # 启用外键支持
-            cursor.execute('PRAGMA foreign_keys = ON')
-            # 设置 WAL 模式以提高并发性
+            # 设置 WAL 模式以提高并发性；该设置写入数据库文件，只需执行一次
+            # 其余连接级 PRAGMA 已由 _open_connection 在创建连接时通过 _configure_connection 设置
             cursor.execute('PRAGMA journal_mode = WAL')
-            # 优化同步模式以平衡性能和安全性
-            cursor.execute('PRAGMA synchronous = NORMAL')
-            # 设置更大的缓存大小（例如 64MB）
-            cursor.execute('PRAGMA cache_size = -64000')
 
             # --- 表定义 ---
             # 注意: 所有 DATETIME 字段已替换为 INTEGER 以存储 Unix 时间戳。
@@ -136,40 +194,40 @@ class SQLiteDB:
             ''')
 
             # `user_room` 连接表（多对多关系）
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_room (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_uuid TEXT NOT NULL,
-                    room_uuid TEXT NOT NULL,
-                    role TEXT DEFAULT 'member' CHECK (role IN ('owner', 'admin', 'member')),
-                    is_muted INTEGER DEFAULT 0,
-                    joined_at INTEGER DEFAULT (strftime('%s', 'now')),
-                    left_at INTEGER,
-                    FOREIGN KEY (user_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
-                    FOREIGN KEY (room_uuid) REFERENCES room(room_uuid) ON DELETE CASCADE,
-                    UNIQUE(user_uuid, room_uuid)
-                )
-            ''')
+            cursor.execute(_USER_ROOM_DDL.format(table='user_room'))
 
             # `message_read_status` 表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS message_read_status (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_uuid TEXT NOT NULL,
-                    message_uuid TEXT NOT NULL,
-                    room_uuid TEXT NOT NULL,
-                    read_at INTEGER DEFAULT (strftime('%s', 'now')),
-                    FOREIGN KEY (user_uuid) REFERENCES user(user_uuid) ON DELETE CASCADE,
-                    FOREIGN KEY (message_uuid) REFERENCES message(msg_uuid) ON DELETE CASCADE,
-                    FOREIGN KEY (room_uuid) REFERENCES room(room_uuid) ON DELETE CASCADE,
-                    UNIQUE(user_uuid, message_uuid)
-                )
-            ''')
+            cursor.execute(_MESSAGE_READ_STATUS_DDL.format(table='message_read_status'))
+
+            # 旧版本的关系表带有自增 id 列，重建为 WITHOUT ROWID 结构（需在创建索引之前完成）
+            self._migrate_to_without_rowid(conn, 'user_room', _USER_ROOM_DDL, _USER_ROOM_COLUMNS)
+            self._migrate_to_without_rowid(conn, 'message_read_status', _MESSAGE_READ_STATUS_DDL,
+                                           _MESSAGE_READ_STATUS_COLUMNS)
 
             # 创建索引以提升性能
             self._create_indexes(cursor)
 
+    def _migrate_to_without_rowid(self, conn: sqlite3.Connection, table: str, ddl: str, columns: str):
+        """
+        一次性迁移：若 table 仍是带 id 列的旧结构，则在同一事务中按 ddl 新建临时表、
+        复制数据、删除旧表并改名。旧表上的索引随旧表删除，之后由 _create_indexes 重新创建。
+        """
+        if conn.execute(f"SELECT 1 FROM pragma_table_info('{table}') WHERE name = 'id'").fetchone() is None:
+            return
+
+        logging.info(f"开始将 {table} 迁移为 WITHOUT ROWID 结构...")
+        new_table = f'{table}_new'
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(ddl.format(table=new_table))
+            conn.execute(f'INSERT INTO {new_table} ({columns}) SELECT {columns} FROM {table}')
+            conn.execute(f'DROP TABLE {table}')
+            conn.execute(f'ALTER TABLE {new_table} RENAME TO {table}')
             conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        logging.info(f"{table} 迁移完成。")
 
     def _create_indexes(self, cursor):
         """创建索引以提高查询性能"""
@@ -177,94 +235,212 @@ class SQLiteDB:
             # user 表索引
             'CREATE INDEX IF NOT EXISTS idx_user_qq_number ON user(qq_number)',
             'CREATE INDEX IF NOT EXISTS idx_user_role ON user(role)',
-            'CREATE INDEX IF NOT EXISTS idx_user_is_active ON user(is_active)',
             'CREATE INDEX IF NOT EXISTS idx_user_created_at ON user(created_at)',
+            # 部分索引只包含满足条件的行，代替单独索引布尔列
+            'CREATE INDEX IF NOT EXISTS idx_user_active_created ON user(created_at) WHERE is_active = 1',
 
             # room 表索引
             'CREATE INDEX IF NOT EXISTS idx_room_creator ON room(creator)',
-            'CREATE INDEX IF NOT EXISTS idx_room_is_active ON room(is_active)',
             'CREATE INDEX IF NOT EXISTS idx_room_created_at ON room(created_at)',
 
             # message 表索引
             'CREATE INDEX IF NOT EXISTS idx_message_sender ON message(sender)',
-            'CREATE INDEX IF NOT EXISTS idx_message_room_uuid ON message(room_uuid)',
             'CREATE INDEX IF NOT EXISTS idx_message_created_at ON message(created_at)',
-            'CREATE INDEX IF NOT EXISTS idx_message_msg_type ON message(msg_type)',
-            'CREATE INDEX IF NOT EXISTS idx_message_is_deleted ON message(is_deleted)',
             'CREATE INDEX IF NOT EXISTS idx_message_reply_to ON message(reply_to)',
-            'CREATE INDEX IF NOT EXISTS idx_message_room_time ON message(room_uuid, created_at DESC)',
+            # 房间消息只保留一个复合索引：按房间查询（包括删除房间时的级联删除）使用其前导列，
+            # 未删除消息按时间排序使用 (room_uuid, is_deleted = 0, created_at) 前缀
             'CREATE INDEX IF NOT EXISTS idx_message_room_active ON message(room_uuid, is_deleted, created_at DESC)',
 
             # private_message 表索引
-            'CREATE INDEX IF NOT EXISTS idx_pm_sender ON private_message(sender_uuid)',
             'CREATE INDEX IF NOT EXISTS idx_pm_receiver ON private_message(receiver_uuid)',
             'CREATE INDEX IF NOT EXISTS idx_pm_created_at ON private_message(created_at)',
-            'CREATE INDEX IF NOT EXISTS idx_pm_is_read ON private_message(is_read)',
+            # 按发送方的查询使用 idx_pm_conversation 的前导列
             'CREATE INDEX IF NOT EXISTS idx_pm_conversation ON private_message(sender_uuid, receiver_uuid, created_at DESC)',
+            # 未读私聊收件箱
+            'CREATE INDEX IF NOT EXISTS idx_pm_unread ON private_message(receiver_uuid, created_at DESC) WHERE is_read = 0',
 
-            # user_room 表索引
-            'CREATE INDEX IF NOT EXISTS idx_user_room_user ON user_room(user_uuid)',
+            # user_room 表索引（按 user_uuid 的查询由主键前缀覆盖）
             'CREATE INDEX IF NOT EXISTS idx_user_room_room ON user_room(room_uuid)',
             'CREATE INDEX IF NOT EXISTS idx_user_room_joined_at ON user_room(joined_at)',
             'CREATE INDEX IF NOT EXISTS idx_user_room_left_at ON user_room(left_at)',
 
-            # message_read_status 表索引
-            'CREATE INDEX IF NOT EXISTS idx_read_status_user ON message_read_status(user_uuid)',
+            # message_read_status 表索引（按 user_uuid 的查询由主键前缀覆盖）
             'CREATE INDEX IF NOT EXISTS idx_read_status_room ON message_read_status(room_uuid)',
             'CREATE INDEX IF NOT EXISTS idx_read_status_message ON message_read_status(message_uuid)',
+
+            # 布尔列和取值很少的列单独建索引时查询规划器几乎不会使用，却要在每次写入时维护；
+            # 已有数据库中删除这些索引
+            'DROP INDEX IF EXISTS idx_user_is_active',
+            'DROP INDEX IF EXISTS idx_room_is_active',
+            'DROP INDEX IF EXISTS idx_message_msg_type',
+            'DROP INDEX IF EXISTS idx_message_is_deleted',
+            'DROP INDEX IF EXISTS idx_pm_is_read',
+
+            # 已被复合索引前缀覆盖的冗余索引
+            'DROP INDEX IF EXISTS idx_message_room_uuid',
+            'DROP INDEX IF EXISTS idx_message_room_time',
+            'DROP INDEX IF EXISTS idx_pm_sender',
         ]
 
         for index_sql in indexes:
             cursor.execute(index_sql)
 
+    def _configure_connection(self, conn: sqlite3.Connection):
+        """
+        为新连接应用连接级 PRAGMA。
+        这些设置不会保存在数据库文件中，每个连接都必须在创建时各自设置一次。
+        """
+        # 启用外键支持
+        conn.execute('PRAGMA foreign_keys = ON')
+        # 优化同步模式以平衡性能和安全性
+        conn.execute('PRAGMA synchronous = NORMAL')
+        # 设置更大的缓存大小（例如 64MB）
+        conn.execute('PRAGMA cache_size = -64000')
+        # 以内存映射方式读取数据库文件（256MB），热点页面无需 read() 系统调用
+        conn.execute('PRAGMA mmap_size = 268435456')
+        # 临时表和临时索引保存在内存中
+        conn.execute('PRAGMA temp_store = MEMORY')
+        # 写锁被占用时在 SQLite 内部重试最多 5 秒，而不是立即抛出 database is locked
+        conn.execute('PRAGMA busy_timeout = 5000')
+        # 每 1000 页自动检查点一次（显式写出默认值）；检查点后 WAL 文件截断到 64MB 以内
+        conn.execute('PRAGMA wal_autocheckpoint = 1000')
+        conn.execute('PRAGMA journal_size_limit = 67108864')
+
+    def _open_connection(self, readonly: bool = False) -> sqlite3.Connection:
+        """创建一个已配置好的连接，readonly 时以只读模式打开数据库文件"""
+        if readonly:
+            database, uri = Path(self.db_path).resolve().as_uri() + '?mode=ro', True
+        else:
+            database, uri = self.db_path, False
+        try:
+            conn = sqlite3.connect(
+                database,
+                uri=uri,
+                check_same_thread=False, # 连接会在不同线程之间借出和归还
+                timeout=30.0,
+                # 每个连接按 SQL 文本缓存最多 256 条预编译语句，相同的 SQL 不再重新解析
+                cached_statements=256,
+                # 关闭 sqlite3 的隐式事务：它会在写语句前自动开启 DEFERRED 事务，
+                # 首次写入时才升级写锁，并发时容易遇到 SQLITE_BUSY。单条语句自动提交，
+                # 多条语句由调用方显式 BEGIN IMMEDIATE ... COMMIT
+                isolation_level=None
+            )
+        except sqlite3.Error as e:
+            logging.error(f"连接数据库失败: {e}")
+            raise
+        # 使用 sqlite3.Row 作为行工厂，以获取类似字典的行
+        conn.row_factory = sqlite3.Row
+        self._configure_connection(conn)
+        if readonly:
+            conn.execute('PRAGMA query_only = 1')
+        return conn
+
+    def _acquire(self, readonly: bool) -> sqlite3.Connection:
+        """从连接池借出连接；只读连接池未满时直接创建新连接，否则等待其他线程归还"""
+        if not readonly:
+            return self._write_pool.get(timeout=self.pool_timeout)
+
+        try:
+            return self._read_pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._read_lock:
+            can_open = self._read_opened < self.read_pool_size
+            if can_open:
+                self._read_opened += 1
+        if not can_open:
+            return self._read_pool.get(timeout=self.pool_timeout)
+        try:
+            return self._open_connection(readonly=True)
+        except sqlite3.Error:
+            with self._read_lock:
+                self._read_opened -= 1
+            raise
+
     @contextmanager
-    def get_connection(self):
+    def get_connection(self, readonly: bool = False):
         """
         获取数据库连接的上下文管理器。
-        它为每个线程维护一个独立的连接，以确保线程安全。
+        默认借出唯一的写连接；readonly=True 时借出只读连接，WAL 模式下读连接不会被写连接阻塞。
+        同一时间一个连接只会被一个线程持有，退出时归还连接池。
         """
-        # 检查当前线程是否已存在连接
-        if not hasattr(self._local, 'connection'):
-            try:
-                # 如果不存在，为该线程创建一个新连接
-                self._local.connection = sqlite3.connect(
-                    self.db_path,
-                    check_same_thread=False, # 线程本地使用所需
-                    timeout=30.0
-                )
-                # 使用 sqlite3.Row 作为行工厂，以获取类似字典的行
-                self._local.connection.row_factory = sqlite3.Row
-                self._local.connection.execute('PRAGMA foreign_keys = ON')
-            except sqlite3.Error as e:
-                logging.error(f"连接数据库失败: {e}")
-                raise
-
+        pool = self._read_pool if readonly else self._write_pool
+        conn = self._acquire(readonly)
         try:
-            yield self._local.connection
+            yield conn
         except Exception as e:
-            # 在事务期间发生任何异常时回滚
-            self._local.connection.rollback()
-            logging.error(f"数据库操作失败，事务已回滚: {e}")
+            logging.error(f"数据库操作失败: {e}")
             raise
         finally:
-            # 此处故意不关闭连接。
-            # 它保持打开状态，以便在同一线程内重用以提高性能。
-            # 应用程序负责在线程结束时调用 close_connection()。
-            pass
+            try:
+                # 归还前回滚遗留的未提交事务（包括异常退出时的事务）
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error as e:
+                # 回滚失败时连接状态不可信，换一个新连接归还
+                logging.error(f"回滚失败，重新打开连接: {e}")
+                conn = self._reopen_connection(conn, readonly)
+            finally:
+                # 无论回滚是否成功都要归还：写连接只有一个，不归还会让之后的写操作全部超时
+                pool.put(conn)
+
+    def _reopen_connection(self, conn: sqlite3.Connection, readonly: bool) -> sqlite3.Connection:
+        """关闭 conn 并返回新打开的连接；新连接打不开时返回原连接，让后续调用报错而不是等待超时"""
+        try:
+            new_conn = self._open_connection(readonly=readonly)
+        except sqlite3.Error:
+            return conn
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logging.warning(f"关闭异常连接失败: {e}")
+        return new_conn
 
-    def close_connection(self):
+    def close(self):
+        """
+        关闭连接池中的所有连接。应用关闭时调用；正被借出的连接在归还后不会被关闭。
+        关闭写连接前执行一次 PRAGMA optimize，使下次启动时的统计信息保持最新。
         """
-        关闭当前线程的数据库连接。
-        **重要**: 应用程序必须在线程结束时或应用关闭时调用此方法，以防止连接泄漏。
+        self._closed = True
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+        for pool in (self._read_pool, self._write_pool):
+            while True:
+                try:
+                    conn = pool.get_nowait()
+                except queue.Empty:
+                    break
+                if pool is self._write_pool:
+                    try:
+                        conn.execute('PRAGMA optimize')
+                    except sqlite3.Error as e:
+                        logging.error(f"PRAGMA optimize 失败: {e}")
+                conn.close()
+        with self._read_lock:
+            self._read_opened = 0
+        logging.info("SQLite连接池已关闭")
+
+    def execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        """
+        执行单条SQL。连接处于自动提交模式，写语句执行完即已提交。
+        直接调用 Connection.execute，同一条 SQL 文本命中连接的预编译语句缓存。
+
+        Args:
+            sql (str): 要执行的SQL语句。
+            params (tuple): SQL参数。
+
+        Returns:
+            List[sqlite3.Row]: 查询结果行，写语句返回空列表。
         """
-        if hasattr(self._local, 'connection'):
-            self._local.connection.close()
-            delattr(self._local, 'connection')
-            logging.info("已为当前线程关闭数据库连接。")
+        with self.get_connection() as conn:
+            return conn.execute(sql, params).fetchall()
 
     def execute_transaction(self, operations: List[tuple]):
         """
         在单个事务中执行多个SQL操作。
+        相邻且 SQL 相同的操作合并为一次 executemany，由 sqlite3 在 C 层循环绑定参数。
 
         Args:
             operations (List[tuple]): 一个操作列表，每个元素是一个 (sql, params) 的元组。
@@ -273,10 +449,15 @@ class SQLiteDB:
             bool: 成功返回 True，失败返回 False。
         """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
             try:
-                for sql, params in operations:
-                    cursor.execute(sql, params or ())
+                # IMMEDIATE 在事务开始时即获取写锁，避免中途由读锁升级为写锁时遇到 SQLITE_BUSY
+                conn.execute('BEGIN IMMEDIATE')
+                for sql, group in itertools.groupby(operations, key=lambda op: op[0]):
+                    params_seq = [params or () for _, params in group]
+                    if len(params_seq) == 1:
+                        conn.execute(sql, params_seq[0])
+                    else:
+                        conn.executemany(sql, params_seq)
                 conn.commit()
                 return True
             except sqlite3.Error as e:
@@ -298,6 +479,51 @@ class SQLiteDB:
             conn.execute('ANALYZE')
             logging.info("数据库 ANALYZE 完成。")
 
+    def optimize(self):
+        """
+        执行 PRAGMA optimize，只重新分析自上次分析以来变化较大的表。
+        0x10002 表示检查所有表，而不仅是本连接查询过的表；没有变化时几乎没有开销。
+        """
+        with self.get_connection() as conn:
+            conn.execute('PRAGMA optimize = 0x10002')
+
+    def checkpoint_if_needed(self):
+        """
+        WAL 文件超过 wal_size_limit 时执行 wal_checkpoint(TRUNCATE)。
+        长时间持有读快照的连接会阻止自动检查点回绕 WAL，使其无限增长，读取时需要在 WAL 中查找的页面越来越多。
+        """
+        try:
+            wal_size = os.stat(self.db_path + '-wal').st_size
+        except FileNotFoundError:
+            return
+        if wal_size <= self.wal_size_limit:
+            return
+
+        with self.get_connection() as conn:
+            busy, log_pages, checkpointed = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+        if busy:
+            # 仍有读者持有旧快照，本次只完成了部分检查点，下次再试
+            logging.warning(f"WAL 检查点被阻塞: WAL {wal_size} 字节，已写回 {checkpointed}/{log_pages} 页")
+        else:
+            logging.info(f"WAL 检查点完成，已截断 {wal_size} 字节的 WAL 文件")
+
+    def _schedule(self, name: str, interval: float, task):
+        """在 interval 秒后于后台线程执行一次 task，执行完再安排下一次"""
+        timer = threading.Timer(interval, self._run_scheduled, args=(name, interval, task))
+        timer.daemon = True
+        self._timers[name] = timer
+        timer.start()
+
+    def _run_scheduled(self, name: str, interval: float, task):
+        if self._closed:
+            return
+        try:
+            task()
+        except Exception as e:
+            logging.error(f"后台任务 {name} 失败: {e}")
+        if not self._closed:
+            self._schedule(name, interval, task)
+
     def get_database_info(self) -> dict:
         """
         获取数据库的元信息，如大小和表中的行数。
@@ -305,7 +531,7 @@ class SQLiteDB:
         Returns:
             dict: 包含数据库信息的字典。
         """
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=True) as conn:
             cursor = conn.cursor()
 
             cursor.execute("SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()")
@@ -314,11 +540,12 @@ class SQLiteDB:
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
             tables = [row[0] for row in cursor.fetchall()]
 
+            # 所有表的记录数合并为一条 UNION ALL 查询，一次执行取回
             table_info = {}
-            for table in tables:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                count = cursor.fetchone()[0]
-                table_info[table] = count
+            if tables:
+                sql = ' UNION ALL '.join(f"SELECT ?, COUNT(*) FROM {table}" for table in tables)
+                cursor.execute(sql, tables)
+                table_info = {name: count for name, count in cursor.fetchall()}
 
             return {
                 'database_size_bytes': db_size,
@@ -1,5 +1,10 @@
 ﻿"""app/models/state.py"""
+import asyncio
 from pathlib import Path
+from typing import Callable
+
+import jinja2
+from fastapi.templating import Jinja2Templates
 from fastapi.datastructures import State
 from app.db.db import AbstractAsyncDB
 from app.utils.registration_code import RegKey
@@ -10,8 +15,12 @@ from app.kv import Kv
 class AppState(State):
     db: AbstractAsyncDB
     rsa: Rsa
+    rsa_ready: asyncio.Event
+    rsa_error: Exception | None
     key: str
     kv: Kv
     rk: RegKey
     DIR_base: Path
     DIR_web: Path
+    templates: Jinja2Templates
+    get_template: Callable[[str], jinja2.Template]
@@ -1,4 +1,5 @@
 ﻿"""app/routes/api.py"""
+import hmac
 import uuid
 import aiofiles
 
@@ -36,6 +37,10 @@ async def rs(response: Response, request: Request, user_key_pub_pem: str = Form(
     if not Check.Rsa.key_pub_pem(user_key_pub_pem):
         return res_no_encrypt("无效的 RSA 公钥")
     state = get_state(request.app)
+    await state.rsa_ready.wait()
+    if state.rsa_error is not None:
+        response.status_code = 503
+        return res_no_encrypt('服务器密钥不可用', code=100503)
 
     sha256 = Eec.Hash.sha256(user_key_pub_pem + uuid.uuid4().hex)
     aes_key = sha256[:16]
@@ -71,7 +76,7 @@ async def api_post(request: Request, response: Response):
     session_user = request.headers.get("session_user")
     if not session_user:
         return res_no_encrypt("无有效的加密通道")
-    if Eec.Hash.sha256(aes_key) != session_user:  # 用于防止csrf
+    if not hmac.compare_digest(Eec.Hash.sha256(aes_key).encode(), session_user.encode()):  # 用于防止csrf
         return res_no_encrypt("头部加密错误")
     try:
         raw_body = await request.body()
@@ -0,0 +1,47 @@
+﻿"""app/utils/keyfile.py"""
+import os
+from pathlib import Path
+from typing import Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，退化为无锁写入（os.replace 仍保证原子性）
+    fcntl = None
+
+
+def load_or_create(path: Path, create: Callable[[], bytes], mode: int = 0o600) -> bytes:
+    """
+    读取磁盘上缓存的密钥材料，不存在时调用 create() 生成并原子写入。
+
+    多个 worker 同时启动时通过 flock 串行化生成过程，
+    拿到锁后会再次检查文件是否已被其他进程写入，避免重复生成。
+
+    :param path: 密钥文件路径。
+    :param create: 生成密钥材料的函数，仅在首次运行时调用。
+    :param mode: 写入文件的权限。
+    :return: 密钥材料的字节内容。
+    """
+    path = Path(path)
+    if path.is_file():
+        return path.read_bytes()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if path.is_file():
+                return path.read_bytes()
+
+            data = create()
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            return data
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -1,5 +1,6 @@
 ﻿"""app/utils/registration_code.py"""
 
+import hmac
 import json
 import uuid
 from typing import Optional
@@ -53,7 +54,7 @@ class RegKey:
             if key_type == "all":
                 key_name = f"RK:all:{uuid_str}"
                 stored_key = await state.kv.get(key_name)
-                if stored_key != reg_key:
+                if not stored_key or not hmac.compare_digest(stored_key.encode(), reg_key.encode()):
                     return False
                 await state.kv.delete(key_name)
                 return True
@@ -61,7 +62,7 @@ class RegKey:
             elif key_type == "qq":
                 key_name = f"RK:qq:{uuid_str}"
                 stored_key = await state.kv.get(key_name)
-                if stored_key != reg_key:
+                if not stored_key or not hmac.compare_digest(stored_key.encode(), reg_key.encode()):
                     return False
                 if k.get("qq_number") != qq_number:
                     return False
@@ -1,9 +1,24 @@
 ﻿# app/utils/response.py
-import json
 from typing import Any, Dict
 
+import orjson
+from fastapi.responses import JSONResponse
+
 from app.utils.eec import Eec
 
+# 响应体和加密载荷共用的序列化选项：无时区的 datetime 按 UTC 处理，允许非字符串键
+_ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+
+class OrjsonResponse(JSONResponse):
+    """
+    使用 orjson 序列化的 JSONResponse，作为应用的默认响应类。
+    不继承 fastapi.responses.ORJSONResponse：新版 FastAPI 已将其标记为弃用，继承时会发出弃用警告。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=_ORJSON_OPTIONS)
+
 
 def res(data: Any | None, old_key: str, new_key: str, message: str = "OK", code: int = 0) -> Dict[str, Any]:
     r = {
@@ -13,7 +28,7 @@ def res(data: Any | None, old_key: str, new_key: str, message: str = "OK", code:
     return {
         "code": code,
         "message": message,
-        "data": Eec.Aes.Gcm.encrypt_str(json.dumps(r), old_key)
+        "data": Eec.Aes.Gcm.encrypt_str(orjson.dumps(r, option=_ORJSON_OPTIONS).decode(), old_key)
     }
 
 
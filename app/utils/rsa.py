@@ -2,30 +2,52 @@
 from Crypto.Cipher import PKCS1_OAEP
 from Crypto.Hash import SHA256
 from base64 import b64encode, b64decode
+from pathlib import Path
+from typing import Optional
 import binascii
 
+from app.utils.keyfile import load_or_create
+
 
 class Rsa:
     def __init__(self, name="RSA-OAEP", hash_algo="SHA-256"):
         self.name = name
         self.hash_algo = hash_algo
         self.key_pair = None
+        # 公钥及其 PEM/DER 编码在 init 时计算一次，之后直接返回
+        self._public_key = None
+        self._public_pem: Optional[str] = None
+        self._public_der: Optional[bytes] = None
+
+    def init(self, key_path: Optional[Path] = None):
+        """
+        初始化服务器密钥对。
 
-    def init(self):
+        :param key_path: 私钥 PEM 缓存路径。文件存在时直接解析，
+                         否则生成一次并写入该路径，后续启动无需重新生成。
+                         为 None 时每次都重新生成。
+        """
         try:
-            self.key_pair = RSA.generate(2048)
+            if key_path is None:
+                self.key_pair = RSA.generate(2048)
+            else:
+                pem = load_or_create(key_path, lambda: RSA.generate(2048).export_key('PEM'))
+                self.key_pair = RSA.import_key(pem)
+            self._public_key = self.key_pair.publickey()
+            self._public_pem = self._public_key.export_key('PEM').decode()
+            self._public_der = self._public_key.export_key('DER')
         except Exception as e:
             raise RuntimeError(f"密钥生成失败: {e}")
 
     def get_public_key_pem(self) -> str:
         if not self.key_pair:
             raise ValueError("密钥尚未初始化")
-        try:
-            public_key = self.key_pair.publickey()
-            pem = public_key.export_key().decode()
-            return pem
-        except Exception as e:
-            raise RuntimeError(f"导出公钥失败: {e}")
+        return self._public_pem
+
+    def get_public_key_der(self) -> bytes:
+        if not self.key_pair:
+            raise ValueError("密钥尚未初始化")
+        return self._public_der
 
     def encrypt(self, plain_text: str, PublicKey_pem=None, use_myPublicKey=False, output='base64') -> str:
         try:
@@ -63,7 +85,7 @@ class Rsa:
         if use_myKey:
             if not self.key_pair:
                 raise ValueError("公钥未初始化")
-            return self.key_pair.publickey()
+            return self._public_key
         if not pem:
             raise ValueError("必须提供 PEM 格式公钥或启用 use_myPublicKey")
 
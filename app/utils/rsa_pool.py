@@ -0,0 +1,164 @@
+﻿"""app/utils/rsa_pool.py"""
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from Crypto.PublicKey import RSA
+
+logger = logging.getLogger(__name__)
+
+
+class RsaPool:
+    """
+    预生成的 RSA 密钥池，用于多 worker / 热重载场景。
+    每个 worker 启动时通过 os.rename 原子地认领一个已生成的私钥，
+    后台线程负责在池子低于水位时补充，把密钥生成移出启动路径。
+
+    目录结构：
+        {base_dir}/pool/*.pem        待认领的私钥
+        {base_dir}/claimed/{pid}.pem 已被某个 worker 认领的私钥
+    """
+
+    def __init__(self, base_dir: Path, size: int = 4, bits: int = 2048):
+        """
+        :param base_dir: 密钥池根目录。
+        :param size: 池中保持的私钥数量（水位）。
+        :param bits: 生成的 RSA 密钥长度。
+        """
+        self.pool_dir = Path(base_dir) / 'pool'
+        self.claimed_dir = Path(base_dir) / 'claimed'
+        self.size = size
+        self.bits = bits
+        # 同一时间只允许一个进程补充密钥池，避免所有 worker 同时生成
+        self._sentinel = self.pool_dir / '.filling'
+        self._sentinel_timeout = 600
+        self.logger = logger
+
+        self.pool_dir.mkdir(parents=True, exist_ok=True)
+        self.claimed_dir.mkdir(parents=True, exist_ok=True)
+
+    def claim(self) -> Path:
+        """
+        认领一个私钥并返回其路径。
+        池为空时返回的路径尚不存在，调用方（Rsa.init）会在该路径上生成新密钥。
+        认领前先回收已退出 worker 遗留的私钥。
+        """
+        self.reclaim()
+        target = self.claimed_dir / f'{os.getpid()}.pem'
+        for entry in sorted(self.pool_dir.glob('*.pem')):
+            try:
+                os.rename(entry, target)
+                return target
+            except FileNotFoundError:
+                continue  # 已被其他 worker 认领
+        return target
+
+    def reclaim(self) -> int:
+        """
+        将已不存在的进程认领的私钥放回池中，返回回收的数量。
+        worker 崩溃时不会调用 release，不回收的话 claimed/ 中的密钥只增不减。
+        """
+        if os.name == 'nt':
+            # Windows 下 os.kill(pid, 0) 会发送 CTRL_C_EVENT 而不是探测进程，不做回收
+            return 0
+        reclaimed = 0
+        for entry in self.claimed_dir.glob('*.pem'):
+            if not entry.stem.isdigit() or _pid_alive(int(entry.stem)):
+                continue
+            try:
+                os.rename(entry, self.pool_dir / f'{entry.stem}-{time.time_ns()}.pem')
+            except FileNotFoundError:
+                continue  # 已被其他 worker 回收
+            reclaimed += 1
+            try:
+                os.unlink(entry.with_name(entry.name + '.lock'))
+            except FileNotFoundError:
+                pass
+        if reclaimed:
+            self.logger.info("已回收 %d 个退出进程遗留的 RSA 私钥", reclaimed)
+        return reclaimed
+
+    def release(self, path: Path):
+        """删除本进程认领的私钥"""
+        for p in (path, path.with_name(path.name + '.lock')):
+            try:
+                os.unlink(p)
+            except FileNotFoundError:
+                pass
+
+    def fill(self) -> int:
+        """
+        将密钥池补充到水位，返回本次生成的密钥数量。
+        其他进程正在补充时直接返回 0。
+        """
+        if not self._acquire_sentinel():
+            return 0
+        generated = 0
+        try:
+            while len(list(self.pool_dir.glob('*.pem'))) < self.size:
+                pem = RSA.generate(self.bits).export_key('PEM')
+                name = f'{os.getpid()}-{time.time_ns()}'
+                tmp_path = self.pool_dir / f'{name}.tmp'
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(pem)
+                os.rename(tmp_path, self.pool_dir / f'{name}.pem')
+                generated += 1
+        finally:
+            self._release_sentinel()
+        return generated
+
+    def start_filler(self, interval: int = 30) -> threading.Thread:
+        """启动后台补充线程（守护线程，随进程退出）"""
+
+        def _run():
+            while True:
+                try:
+                    generated = self.fill()
+                    if generated:
+                        self.logger.info("RSA 密钥池已补充 %d 个密钥", generated)
+                except Exception as e:
+                    self.logger.error("RSA 密钥池补充失败: %s", e)
+                time.sleep(interval)
+
+        thread = threading.Thread(target=_run, name='rsa-pool-filler', daemon=True)
+        thread.start()
+        return thread
+
+    # ======================
+    # 私有方法
+    # ======================
+
+    def _acquire_sentinel(self) -> bool:
+        try:
+            fd = os.open(self._sentinel, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            os.close(fd)
+            return True
+        except FileExistsError:
+            # 持有者异常退出时清理过期的哨兵文件
+            try:
+                if time.time() - self._sentinel.stat().st_mtime > self._sentinel_timeout:
+                    os.unlink(self._sentinel)
+            except FileNotFoundError:
+                pass
+            return False
+
+    def _release_sentinel(self):
+        try:
+            os.unlink(self._sentinel)
+        except FileNotFoundError:
+            pass
+
+
+def _pid_alive(pid: int) -> bool:
+    """进程是否仍然存在；属于其他用户的进程（无权发送信号）视为存在"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
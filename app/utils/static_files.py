@@ -0,0 +1,92 @@
+﻿"""app/utils/static_files.py"""
+import mimetypes
+import os
+import stat
+
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, PathLike, StaticFiles
+from starlette.types import Scope
+
+# 按优先级排列的预压缩文件后缀
+_PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    带缓存头的静态文件服务。
+
+    - 带版本参数 v 的请求（由 url_for 生成，文件变化时 URL 随之变化）返回长效 Cache-Control，
+      浏览器在有效期内不再回源；文件名没有指纹，不带版本的请求每次都用 ETag 协商
+    - ETag 由 inode + mtime 生成，无需读取文件内容
+    - 客户端支持时优先返回同目录下预压缩的 .br / .gz 文件
+    文件内容本身由 FileResponse 发送，ASGI 服务器支持时走 sendfile 零拷贝。
+    """
+
+    def __init__(self, *args, max_age: int = 31536000, url_prefix: str = "/static", **kwargs):
+        """
+        :param max_age: 带版本参数时的缓存有效期（秒），0 表示每次都需要协商缓存。
+        :param url_prefix: 挂载路径，url_for 生成的 URL 以此开头。
+        """
+        super().__init__(*args, **kwargs)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.cache_control = "no-cache"
+        if max_age > 0:
+            self.versioned_cache_control = f"public, max-age={max_age}, immutable"
+            # 文件在部署后不再变化，版本号按路径缓存
+            self._versions: dict[str, str] | None = {}
+        else:
+            # 调试模式下文件随时会改，每次重新读取 mtime
+            self.versioned_cache_control = "no-cache"
+            self._versions = None
+
+    def url_for(self, path: str) -> str:
+        """返回带版本参数的静态资源 URL，版本取文件的 mtime；文件不存在时不带版本"""
+        version = self._versions.get(path) if self._versions is not None else None
+        if version is None:
+            try:
+                version = f"{os.stat(os.path.join(self.directory, path)).st_mtime_ns:x}"
+            except OSError:
+                return f"{self.url_prefix}/{path}"
+            if self._versions is not None:
+                self._versions[path] = version
+        return f"{self.url_prefix}/{path}?v={version}"
+
+    def file_response(
+            self,
+            full_path: PathLike,
+            stat_result: os.stat_result,
+            scope: Scope,
+            status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        versioned = "v" in QueryParams(scope.get("query_string", b""))
+        cache_control = self.versioned_cache_control if versioned else self.cache_control
+        headers = {"cache-control": cache_control, "vary": "Accept-Encoding"}
+        media_type = mimetypes.guess_type(str(full_path))[0] or "text/plain"
+
+        accept_encoding = request_headers.get("accept-encoding", "")
+        for encoding, suffix in _PRECOMPRESSED:
+            if encoding not in accept_encoding:
+                continue
+            try:
+                variant_stat = os.stat(f"{full_path}{suffix}")
+            except OSError:
+                continue
+            if stat.S_ISREG(variant_stat.st_mode):
+                full_path = f"{full_path}{suffix}"
+                stat_result = variant_stat
+                headers["content-encoding"] = encoding
+                break
+
+        headers["etag"] = f'"{stat_result.st_ino:x}-{stat_result.st_mtime_ns:x}"'
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -1,6 +1,16 @@
 """config.py"""
 
 class Config:
+    # 调试模式：开启后模板修改自动重新加载
+    debug = False
+    # 启用 SecurityMiddleware（安全响应头与请求日志）
+    security_enabled = False
+
+    class Rsa:
+        # >0 时启用预生成密钥池（多 worker 部署），每个 worker 认领独立的私钥；
+        # 0 表示所有 worker 共用磁盘上缓存的同一个私钥
+        pool_size = 0
+
     class DbConfig:
         use = "sqlite"
 
@@ -2,7 +2,7 @@
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 
-from app.application import app, templates
+from app.application import app, get_template
 
 
 @app.get("/")
@@ -14,8 +14,9 @@ async def root():
 
 @app.get("/hello/{name}", response_class=HTMLResponse)
 async def say_hello(request: Request, name: str):
-    return templates.TemplateResponse("hello.html", {"request": request, "name": name})
+    return HTMLResponse(get_template("hello.html").render(request=request, name=name))
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # 推荐以 `uvicorn main:app --loop uvloop` 启动；loop="auto" 在安装了 uvloop 时同样会使用它
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="auto")